@@ -7,6 +7,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
 from utils.excel_util import list_files_in_output
+from utils.pa_extract import seed_pa_session
 from utils.selenium_util import SeleniumUtil
 
 
@@ -63,6 +64,8 @@ def login(
             print(f"Uploaded")
             time.sleep(30)
 
+    # The next cycle fetches PA pages with the cookies of this login
+    seed_pa_session(_browser)
     _browser.close()
 
 
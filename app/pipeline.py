@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: `func` runs on `workers` threads and returns the item for
+    the next stage, or None to drop it. Exceptions are handed to the pipeline's
+    on_error and the item is dropped.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, busy: float, blocked: float, is_error: bool) -> None:
+        with self._lock:
+            self.items += 1
+            self.errors += int(is_error)
+            self.busy += busy
+            self.blocked += blocked
+
+
+class Pipeline:
+    """
+    Stages connected by queues of at most `queue_size` items, so a slow stage makes
+    the stages before it wait (backpressure) instead of piling up work. Items of
+    different rows are in different stages at the same time.
+    """
+
+    def __init__(
+            self,
+            stages: list[Stage],
+            queue_size: int = 8,
+            on_error: Callable[[Stage, Any, Exception], None] | None = None,
+    ):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_error = on_error or (lambda stage, item, e: print(f"Error in {stage.name} stage: {e}"))
+        self.wall_time = 0.0
+        self._failures: list[BaseException] = []
+
+    def _work(
+            self,
+            stage: Stage,
+            inbox: queue.Queue,
+            outbox: queue.Queue,
+            remaining: list[int],
+            remaining_lock: threading.Lock,
+            next_workers: int,
+    ) -> None:
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                start = time.monotonic()
+                result, is_error = None, False
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    is_error = True
+                    self._report(stage, item, e)
+                busy = time.monotonic() - start
+                if result is not None:
+                    outbox.put(result)
+                stage._record(busy, time.monotonic() - start - busy, is_error)
+        except BaseException as e:
+            self._failures.append(e)
+            # Keep taking this worker's share of the queue so the stages before it can finish
+            while inbox.get() is not _DONE:
+                pass
+        finally:
+            # Also when the worker dies, otherwise the next stage waits for _DONE forever
+            with remaining_lock:
+                remaining[0] -= 1
+                is_last = remaining[0] == 0
+            if is_last:
+                # The last worker of a stage closes the next queue for all its workers
+                for _ in range(next_workers):
+                    outbox.put(_DONE)
+
+    def _report(self, stage: Stage, item: Any, e: Exception) -> None:
+        try:
+            self.on_error(stage, item, e)
+        except Exception as handler_error:
+            print(f"Error in {stage.name} stage: {e} (on_error failed: {handler_error})")
+
+    def run(self, items: Iterable[Any]) -> list[Any]:
+        """
+        Push `items` through every stage. Raises what killed a worker or the
+        iteration of `items`, once every stage has finished.
+
+        :return: Items returned by the last stage, in completion order.
+        """
+        start = time.monotonic()
+        self._failures = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        queues.append(queue.Queue(maxsize=self.queue_size))
+        threads = []
+        for i, stage in enumerate(self.stages):
+            next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            remaining, remaining_lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[i], queues[i + 1], remaining, remaining_lock, next_workers),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        def feed() -> None:
+            try:
+                for item in items:
+                    queues[0].put(item)
+            except BaseException as e:
+                self._failures.append(e)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+        feeder.start()
+
+        results = []
+        while True:
+            result = queues[-1].get()
+            if result is _DONE:
+                break
+            results.append(result)
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        self.wall_time = time.monotonic() - start
+        if self._failures:
+            # A dead worker or a failing `items` is a bug, not a row error: fail the run
+            raise self._failures[0]
+        return results
+
+    def stats(self) -> dict:
+        """
+        Per stage: items, errors, utilization (busy time over workers x wall time) and
+        seconds spent waiting on a full next queue.
+        """
+        wall_time = self.wall_time or 1e-9
+        return {
+            stage.name: {
+                "workers": stage.workers,
+                "items": stage.items,
+                "errors": stage.errors,
+                "utilization": round(stage.busy / (stage.workers * wall_time), 3),
+                "blocked": round(stage.blocked, 3),
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,371 @@
+import os
+import threading
+
+import numpy as np
+
+from model.crawl_model import DeliveryTime, OfferItem
+from model.sheet_model import Product
+
+
+REJECT_CRITERIA = ("delivery_time", "black_list", "min_unit", "min_stock")
+
+_reject_stats = {"accepted": 0, **{criterion: 0 for criterion in REJECT_CRITERIA}}
+_reject_stats_lock = threading.Lock()
+
+
+def offer_filter_stats() -> dict:
+    """
+    Offers accepted and rejected per criterion by every OfferFilter since the last
+    reset_offer_filter_stats(). A retried row is counted once per attempt.
+    """
+    with _reject_stats_lock:
+        return dict(_reject_stats)
+
+
+def reset_offer_filter_stats() -> None:
+    with _reject_stats_lock:
+        for key in _reject_stats:
+            _reject_stats[key] = 0
+
+
+class OfferFilter:
+    """
+    Which PA offers a product accepts, compiled once for the product and its blacklist:
+    its delivery time in seconds, MIN_UNIT, MINSTOCK and the blacklisted sellers as a set.
+    Each rejected offer is counted under the first criterion it fails.
+    """
+
+    def __init__(self, product: Product, black_list: list[str]):
+        self.delivery_seconds = DeliveryTime.from_text(product.DELIVERY_TIME).seconds()
+        self.min_unit = product.MIN_UNIT
+        self.min_stock = product.MINSTOCK
+        self.black_list = frozenset(black_list)
+        self.accepted = 0
+        self.rejects = {criterion: 0 for criterion in REJECT_CRITERIA}
+
+    def reject_reason(self, offer_item: OfferItem) -> str | None:
+        if offer_item.delivery_time is None or offer_item.delivery_time.seconds() > self.delivery_seconds:
+            return "delivery_time"
+        if offer_item.seller.name in self.black_list:
+            return "black_list"
+        if offer_item.min_unit is None or offer_item.min_unit > self.min_unit:
+            return "min_unit"
+        if offer_item.min_stock is None or offer_item.min_stock < self.min_stock:
+            return "min_stock"
+        return None
+
+    def accepts(self, offer_item: OfferItem) -> bool:
+        return self.reject_reason(offer_item) is None
+
+    def apply(self, offer_items: list[OfferItem]) -> list[OfferItem]:
+        """
+        Valid offers of `offer_items` in page order, in one pass.
+        """
+        valid = []
+        rejects = dict.fromkeys(REJECT_CRITERIA, 0)
+        for offer_item in offer_items:
+            reason = self.reject_reason(offer_item)
+            if reason is None:
+                valid.append(offer_item)
+            else:
+                rejects[reason] += 1
+        self._record(len(valid), rejects)
+        return valid
+
+    def _record(self, accepted: int, rejects: dict[str, int]) -> None:
+        self.accepted += accepted
+        for criterion, count in rejects.items():
+            self.rejects[criterion] += count
+        with _reject_stats_lock:
+            _reject_stats["accepted"] += accepted
+            for criterion, count in rejects.items():
+                _reject_stats[criterion] += count
+
+    def stats(self) -> dict:
+        return {"accepted": self.accepted, **self.rejects}
+
+
+class PriceLadder:
+    """
+    Offers sorted once by a price, ties kept in page order, with the offers of
+    blocked (blacklisted) sellers skipped through a precomputed next-allowed index,
+    so the next seller above a price is one bisect away.
+    """
+
+    def __init__(
+            self,
+            offer_items: list[OfferItem],
+            prices: np.ndarray,
+            indexes: np.ndarray | None = None,
+            blocked: np.ndarray | None = None,
+    ):
+        """
+        :param prices: Price of every offer in offer_items.
+        :param indexes: Offers on the ladder, all of them by default.
+        :param blocked: Offers that next_above() skips.
+        """
+        self.offer_items = offer_items
+        if indexes is None:
+            indexes = np.arange(len(offer_items))
+        self.order = indexes[np.argsort(prices[indexes], kind="stable")]
+        self.prices = prices[self.order]
+        allowed = np.ones(len(self.order), dtype=bool) if blocked is None else ~blocked[self.order]
+        # next_allowed[k]: first allowed rung at or after k, len(order) when there is none
+        rungs = np.append(np.where(allowed, np.arange(len(self.order)), len(self.order)), len(self.order))
+        self.next_allowed = np.minimum.accumulate(rungs[::-1])[::-1]
+
+    @classmethod
+    def by_total_price(cls, offer_items: list[OfferItem]) -> "PriceLadder":
+        return cls(offer_items, np.array([item.price for item in offer_items], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def top(self, n: int) -> list[OfferItem]:
+        return [self.offer_items[i] for i in self.order[:n]]
+
+    def next_above(self, price: float) -> int | None:
+        """
+        Index of the cheapest allowed offer priced strictly above `price`, None if there is none.
+        """
+        rung = self.next_allowed[np.searchsorted(self.prices, price, side="right")]
+        return int(self.order[rung]) if rung < len(self.order) else None
+
+    def highest(self) -> int:
+        """
+        Index of the first offer of the highest price, blocked or not.
+        """
+        if len(self.order) == 0:
+            raise ValueError("max() arg is an empty sequence")
+        return int(self.order[np.searchsorted(self.prices, self.prices[-1], side="left")])
+
+
+class OfferBook:
+    """
+    Offers of one PA page packed into NumPy columns, in page order: total price,
+    quantity, delivery seconds, min_unit, min_stock and a seller id. It serves one
+    row: the filter mask, min offer and undercut target of that row are array
+    operations over the page instead of per-offer Python loops.
+    Picks return indexes into `offer_items`; prices handed back to the caller are
+    recomputed in Python from the picked offer so they match the per-item code bit for bit.
+    The offers themselves are never changed, update_price() only re-prices the book.
+    Its NumPy calls cost more than they save on pages of a few dozen offers, see offer_book_for_page().
+    """
+
+    def __init__(self, offer_items: list[OfferItem]):
+        self.offer_items = offer_items
+        # All numeric columns from one conversion of the page
+        columns = np.array(
+            [
+                (
+                    item.price,
+                    item.quantity,
+                    item.delivery_time.seconds() if item.delivery_time is not None else np.inf,
+                    np.nan if item.min_unit is None else item.min_unit,
+                    np.nan if item.min_stock is None else item.min_stock,
+                )
+                for item in offer_items
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 5)
+        self.price = columns[:, 0].copy()
+        self.quantity = columns[:, 1]
+        self.delivery_seconds = columns[:, 2]
+        self.min_unit = columns[:, 3]
+        self.min_stock = columns[:, 4]
+        self.sellers: list[str | None] = []
+        seller_index: dict[str | None, int] = {}
+        seller_ids = []
+        for item in offer_items:
+            name = item.seller.name
+            if name not in seller_index:
+                seller_index[name] = len(self.sellers)
+                self.sellers.append(name)
+            seller_ids.append(seller_index[name])
+        self.seller_id = np.array(seller_ids, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offer_items)
+
+    @property
+    def unit_price(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.price / self.quantity
+
+    def update_price(self, index: int, price: float) -> None:
+        """
+        Price offer_items[index] at `price` from now on, in this book only.
+        """
+        self.price[index] = price
+
+    def effective_unit_price(self, index: int) -> float:
+        """
+        Unit price of offer_items[index] at its price in this book.
+        """
+        return float(self.price[index]) / self.offer_items[index].quantity
+
+    def closest_to_unit_price(self, mask: np.ndarray, target: float, black_list: list[str]) -> int | None:
+        """
+        Index of the masked, not blacklisted offer with a positive quantity whose unit price
+        is closest to `target`, first on ties like min(). None when there is no such offer.
+        """
+        candidates = np.flatnonzero(mask & ~self.blacklisted(black_list) & (self.quantity > 0))
+        if len(candidates) == 0:
+            return None
+        distance = np.abs(self.price[candidates] / self.quantity[candidates] - target)
+        return int(candidates[np.argmin(distance)])
+
+    def blacklisted(self, black_list: list[str]) -> np.ndarray:
+        black_list = set(black_list)
+        blacklisted_sellers = np.array([name in black_list for name in self.sellers], dtype=bool)
+        return blacklisted_sellers[self.seller_id] if len(self) else np.zeros(0, dtype=bool)
+
+    def valid_mask(self, offer_filter: OfferFilter) -> np.ndarray:
+        """
+        OfferFilter.apply() of every offer at once, as a mask, reject counts included.
+        """
+        failed = {
+            "delivery_time": ~(self.delivery_seconds <= offer_filter.delivery_seconds),
+            "black_list": self.blacklisted(offer_filter.black_list),
+            "min_unit": ~(self.min_unit <= offer_filter.min_unit),
+            "min_stock": ~(self.min_stock >= offer_filter.min_stock),
+        }
+        rejected = np.zeros(len(self), dtype=bool)
+        rejects = {}
+        for criterion in REJECT_CRITERIA:
+            # Counted under the first criterion the offer fails, like OfferFilter.reject_reason()
+            first_failed = failed[criterion] & ~rejected
+            rejects[criterion] = int(first_failed.sum())
+            rejected |= first_failed
+        offer_filter._record(len(self) - int(rejected.sum()), rejects)
+        return ~rejected
+
+    def select(self, mask: np.ndarray) -> list[OfferItem]:
+        return [self.offer_items[i] for i in np.flatnonzero(mask)]
+
+    def min_offer_index(self, mask: np.ndarray) -> int | None:
+        """
+        Index of OfferItem.min_offer_item() of the masked offers: lowest total price, first on ties.
+        """
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return None
+        # argmin keeps the first of equal prices like the strict < of min_offer_item()
+        return int(candidates[np.argmin(self.price[candidates])])
+
+    def ladder(self, mask: np.ndarray, black_list: list[str]) -> PriceLadder:
+        """
+        Unit price ladder of the masked offers with a positive quantity, blacklisted sellers blocked.
+        """
+        return PriceLadder(
+            self.offer_items,
+            self.unit_price,
+            indexes=np.flatnonzero(mask & (self.quantity > 0)),
+            blocked=self.blacklisted(black_list),
+        )
+
+    def closest_offer(
+            self,
+            mask: np.ndarray,
+            price: float,
+            profit: float,
+            black_list: list[str],
+    ) -> tuple[float, str]:
+        """
+        Undercut target of calculate_price_change() over the masked offers with a positive quantity:
+        the cheapest allowed offer above `price` in unit price, else the highest priced one, minus
+        `profit`. (-1, "Keep") when `price` is below the first offer of the ladder.
+        """
+        ladder = self.ladder(mask, black_list)
+        if len(ladder) >= 1 and price < self.price[ladder.order[0]]:
+            return -1, "Keep"
+        closest_index = ladder.next_above(price)
+        if closest_index is None:
+            closest_index = ladder.highest()
+        return self.effective_unit_price(closest_index) - profit, self.offer_items[closest_index].seller.name
+
+
+
+class OfferList:
+    """
+    The picks of OfferBook on plain Python lists, for small pages where the fixed cost
+    of the NumPy calls outweighs the per-offer loops. Masks are lists of bools.
+    """
+
+    def __init__(self, offer_items: list[OfferItem]):
+        self.offer_items = offer_items
+        self.price = [item.price for item in offer_items]
+
+    def __len__(self) -> int:
+        return len(self.offer_items)
+
+    def update_price(self, index: int, price: float) -> None:
+        self.price[index] = price
+
+    def effective_unit_price(self, index: int) -> float:
+        return self.price[index] / self.offer_items[index].quantity
+
+    def closest_to_unit_price(self, mask: list[bool], target: float, black_list: list[str]) -> int | None:
+        black_list = set(black_list)
+        candidates = [
+            i for i, item in enumerate(self.offer_items)
+            if mask[i] and item.seller.name not in black_list and item.quantity > 0
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: abs(self.effective_unit_price(i) - target))
+
+    def valid_mask(self, offer_filter: OfferFilter) -> list[bool]:
+        mask = []
+        rejects = dict.fromkeys(REJECT_CRITERIA, 0)
+        for offer_item in self.offer_items:
+            reason = offer_filter.reject_reason(offer_item)
+            mask.append(reason is None)
+            if reason is not None:
+                rejects[reason] += 1
+        offer_filter._record(sum(mask), rejects)
+        return mask
+
+    def select(self, mask: list[bool]) -> list[OfferItem]:
+        return [item for item, valid in zip(self.offer_items, mask) if valid]
+
+    def min_offer_index(self, mask: list[bool]) -> int | None:
+        candidates = [i for i, valid in enumerate(mask) if valid]
+        if not candidates:
+            return None
+        # min() keeps the first of equal prices like the strict < of min_offer_item()
+        return min(candidates, key=lambda i: self.price[i])
+
+    def closest_offer(
+            self,
+            mask: list[bool],
+            price: float,
+            profit: float,
+            black_list: list[str],
+    ) -> tuple[float, str]:
+        black_list = set(black_list)
+        ladder = sorted(
+            (i for i, item in enumerate(self.offer_items) if mask[i] and item.quantity > 0),
+            key=self.effective_unit_price,
+        )
+        if len(ladder) >= 1 and price < self.price[ladder[0]]:
+            return -1, "Keep"
+        above = [
+            i for i in ladder
+            if self.effective_unit_price(i) > price and self.offer_items[i].seller.name not in black_list
+        ]
+        if above:
+            closest_index = above[0]
+        else:
+            closest_index = max(ladder, key=self.effective_unit_price)
+        return self.effective_unit_price(closest_index) - profit, self.offer_items[closest_index].seller.name
+
+
+def offer_book_for_page(offer_items: list[OfferItem]) -> OfferBook | OfferList:
+    """
+    OfferBook of a page with at least PRICING_NUMPY_MIN_OFFERS offers, else OfferList.
+    Both make the same picks.
+    """
+    if len(offer_items) >= int(os.getenv("PRICING_NUMPY_MIN_OFFERS") or 2000):
+        return OfferBook(offer_items)
+    return OfferList(offer_items)
@@ -0,0 +1,177 @@
+import random
+import timeit
+from types import SimpleNamespace
+
+from app.pricing_engine import OfferBook, OfferFilter, OfferList
+from model.crawl_model import DeliveryTime, OfferItem, Seller, TimeUnit
+
+DELIVERY_TIMES = ("1 Hours", "30 Minutes", "2 Hours", "20 Minutes")
+PRICES = (0.1, 1.0, 2.0, 3.5, 7.25, 10.0)
+TARGETS = (0.05, 0.5, 1.0, 2.0, 3.5, 5.0, 100.0)
+
+
+def __reference_is_valid(product, offer_item: OfferItem, black_list: list[str]) -> bool:
+    # is_valid_offer_item() as it was before OfferFilter
+    product_delivery_time = DeliveryTime.from_text(product.DELIVERY_TIME)
+    if offer_item.delivery_time is None or offer_item.delivery_time > product_delivery_time:
+        return False
+    if offer_item.seller.name in black_list:
+        return False
+    if offer_item.min_unit is None or offer_item.min_unit > product.MIN_UNIT:
+        return False
+    if offer_item.min_stock is None or offer_item.min_stock < product.MINSTOCK:
+        return False
+    return True
+
+
+def __reference_closest(sorted_offer_items: list[dict], price: float, profit: float, black_list: list[str]):
+    # get_closest_offer_item() as it was before PriceLadder, on {"item", "price"} entries
+    if len(sorted_offer_items) >= 1 and price < sorted_offer_items[0]["price"]:
+        return -1, "Keep"
+    above_price_items = [
+        entry for entry in sorted_offer_items
+        if entry["price"] / entry["item"].quantity > price and entry["item"].seller.name not in black_list
+    ]
+    if not above_price_items:
+        closest = max(sorted_offer_items, key=lambda entry: entry["price"] / entry["item"].quantity)
+    else:
+        closest = min(above_price_items, key=lambda entry: entry["price"] / entry["item"].quantity)
+    return closest["price"] / closest["item"].quantity - profit, closest["item"].seller.name
+
+
+def __reference_picks(product, offer_items: list[OfferItem], black_list: list[str], target: float, profit: float):
+    """
+    Picks of calculate_price_change() with the per-item code, including its cheapest offer
+    being priced per unit before it is compared with the others.
+    """
+    entries = [
+        {"item": item, "price": item.price}
+        for item in offer_items
+        if __reference_is_valid(product, item, black_list)
+    ]
+    picks = {"valid": [entry["item"].offer_id for entry in entries]}
+    if not entries:
+        return picks
+    min_entry = entries[0]
+    for entry in entries:
+        if entry["price"] < min_entry["price"]:
+            min_entry = entry
+    picks["min"] = min_entry["item"].offer_id
+    if min_entry["item"].quantity == 0:
+        return picks
+    min_entry["price"] = min_entry["price"] / min_entry["item"].quantity
+
+    candidates = [entry for entry in entries if entry["item"].seller.name not in black_list and entry["item"].quantity > 0]
+    if candidates:
+        closest = min(candidates, key=lambda entry: abs(entry["price"] / entry["item"].quantity - target))
+        picks["stock_fake"] = closest["item"].offer_id, closest["price"] / closest["item"].quantity
+
+    sorted_entries = sorted(
+        [entry for entry in entries if entry["item"].quantity > 0],
+        key=lambda entry: entry["price"] / entry["item"].quantity,
+    )
+    try:
+        picks["closest"] = __reference_closest(sorted_entries, target, profit, black_list)
+    except ValueError as e:
+        picks["closest"] = repr(e)
+    return picks
+
+
+def __book_picks(
+        book_class: type[OfferBook | OfferList],
+        product,
+        offer_items: list[OfferItem],
+        black_list: list[str],
+        target: float,
+        profit: float,
+):
+    # The same picks with OfferBook or OfferList, as calculate_price_change() makes them
+    book = book_class(offer_items)
+    mask = book.valid_mask(OfferFilter(product, black_list))
+    picks = {"valid": [item.offer_id for item in book.select(mask)]}
+    min_index = book.min_offer_index(mask)
+    if min_index is None:
+        return picks
+    picks["min"] = offer_items[min_index].offer_id
+    if offer_items[min_index].quantity == 0:
+        return picks
+    book.update_price(min_index, offer_items[min_index].unit_price)
+
+    closest_index = book.closest_to_unit_price(mask, target, black_list)
+    if closest_index is not None:
+        picks["stock_fake"] = offer_items[closest_index].offer_id, book.effective_unit_price(closest_index)
+    try:
+        picks["closest"] = book.closest_offer(mask, target, profit, black_list)
+    except ValueError as e:
+        picks["closest"] = repr(e)
+    return picks
+
+
+def __random_case(rng: random.Random, size: int | None = None):
+    offer_items = [
+        OfferItem(
+            offer_id=str(i),
+            server="server",
+            seller=Seller(name=f"seller{rng.randint(0, 8)}", feedback_count=0, canGetFeedback=True),
+            delivery_time=DeliveryTime(value=rng.choice([1, 2, 20, 30, 45]), unit=rng.choice(list(TimeUnit))),
+            min_unit=rng.choice([1, 5, 10, 20]),
+            min_stock=rng.choice([1, 10, 50, 100, 500]),
+            quantity=rng.choice([0, 1, 2, 3, 10, 100]),
+            price=rng.choice(PRICES),
+        )
+        for i in range(rng.randint(0, 12) if size is None else size)
+    ]
+    product = SimpleNamespace(
+        DELIVERY_TIME=rng.choice(DELIVERY_TIMES),
+        MIN_UNIT=rng.choice([1, 5, 10, 20]),
+        MINSTOCK=rng.choice([1, 10, 50, 100]),
+    )
+    black_list = [f"seller{i}" for i in range(rng.randint(0, 4))]
+    return product, offer_items, black_list, rng.choice(TARGETS), rng.random() / 10
+
+
+def check_pricing_parity(cases: int = 5000, seed: int = 0) -> bool:
+    """
+    Compare the OfferBook and OfferList picks of `cases` random offer pages with the per-item code they replace.
+    """
+    mismatches = 0
+    for case in range(cases):
+        product, offer_items, black_list, target, profit = __random_case(random.Random(seed + case))
+        expected = __reference_picks(product, offer_items, black_list, target, profit)
+        for book_class in (OfferBook, OfferList):
+            actual = __book_picks(book_class, product, offer_items, black_list, target, profit)
+            if expected != actual:
+                mismatches += 1
+                print(f"Case {seed + case}: per-item {expected} != {book_class.__name__} {actual}")
+    print(f"{cases} cases, {mismatches} mismatches")
+    return mismatches == 0
+
+
+def benchmark_pricing(sizes: tuple[int, ...] = (10, 20, 30, 60, 120), number: int = 300) -> None:
+    """
+    Microseconds per row of the per-item picks, OfferList and OfferBook on random pages of each size,
+    to place PRICING_NUMPY_MIN_OFFERS.
+    """
+    print(f"{'offers':>6} {'per-item':>9} {'OfferList':>10} {'OfferBook':>10}")
+    for size in sizes:
+        case = __random_case(random.Random(size), size)
+        timings = [
+            min(timeit.repeat(lambda: picks(*case), number=number, repeat=5)) / number * 1e6
+            for picks in (
+                __reference_picks,
+                lambda *args: __book_picks(OfferList, *args),
+                lambda *args: __book_picks(OfferBook, *args),
+            )
+        ]
+        print(f"{size:>6} {timings[0]:>9.1f} {timings[1]:>10.1f} {timings[2]:>10.1f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m app.pricing_parity [cases] [seed]
+    # python -m app.pricing_parity bench [sizes...]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark_pricing(*([tuple(int(arg) for arg in sys.argv[2:])] if sys.argv[2:] else []))
+        sys.exit(0)
+    sys.exit(0 if check_pricing_parity(*(int(arg) for arg in sys.argv[1:3])) else 1)
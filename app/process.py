@@ -1,12 +1,12 @@
-import copy
 import random
 from typing import Any
 
 import gspread
 
+from app.pricing_engine import OfferFilter, offer_book_for_page
 from decorator.retry import retry
 from decorator.time_execution import time_execution
-from model.crawl_model import G2GOfferItem, OfferItem, DeliveryTime, StockNumInfo
+from model.crawl_model import G2GOfferItem, OfferItem, StockNumInfo
 from model.enums import StockType
 from model.payload import PriceInfo, Row
 from model.sheet_model import G2G, Product, StockInfo
@@ -31,30 +31,19 @@ def get_row_run_index(
     return row_indexes
 
 
-def is_valid_offer_item(
-        product: Product,
-        offer_item: OfferItem,
-        black_list: list[str]
-) -> bool:
-    product_delivery_time = DeliveryTime.from_text(product.DELIVERY_TIME)
-    if (
-            offer_item.delivery_time is None
-            or offer_item.delivery_time > product_delivery_time
-    ):
-        return False
-    # if not offer_item.seller.feedback_count:
-    #     offer_item.seller.feedback_count = 0
-    # elif offer_item.seller.feedback_count < product.FEEDBACK:
-    #     print(f"Feedback count: {offer_item.seller.feedback_count} for seller {offer_item.seller.name}, ignore")
-    #     return False
-    if offer_item.seller.name in black_list:
-        return False
-    if offer_item.min_unit is None or offer_item.min_unit > product.MIN_UNIT:
-        return False
-    if offer_item.min_stock is None or offer_item.min_stock < product.MINSTOCK:
-        return False
+def get_row_run_index_from_snapshot(
+        snapshot: list[list[str]],
+        col_check_index: int = 2,
+        value_check: Any = "1",
+        first_column_index: int = 2,
+) -> list[int]:
+    offset = col_check_index - first_column_index
+    row_indexes: list[int] = []
+    for i, row_value in enumerate(snapshot, start=1):
+        if offset < len(row_value) and row_value[offset] == value_check:
+            row_indexes.append(i)
 
-    return True
+    return row_indexes
 
 
 def filter_valid_offer_items(
@@ -62,11 +51,7 @@ def filter_valid_offer_items(
         offer_items: list[OfferItem],
         black_list: list[str],
 ) -> list[OfferItem]:
-    return [
-        offer_item
-        for offer_item in offer_items
-        if is_valid_offer_item(product, offer_item, black_list)
-    ]
+    return OfferFilter(product, black_list).apply(offer_items)
 
 
 def is_change_price(
@@ -138,7 +123,7 @@ def calculate_price_stock_fake(
             raise Exception(f"Error getting FUN price: {e}")
 
     bij_min_price = None
-    CNY_RATE = getCNYRate()
+    CNY_RATE = getCNYRate(row.resolver)
     if row.bij.BIJ_CHECK == 1:
         try:
             bij_min_price = (row.bij.get_bij_price()
@@ -177,30 +162,29 @@ def calculate_price_change(
         gsheet,
         row.stock_info,
     )
-    offer_items_copy = copy.deepcopy(offer_items)
-
-    if len (offer_items_copy) == 1 and offer_items_copy[0].seller.name in black_list:
+    # Scraped offers are shared with other rows and never modified, prices derived here live in locals
+    if len (offer_items) == 1 and offer_items[0].seller.name in black_list:
         if stock_type is StockType.stock_1:
             min_price = float(row.product.min_price_stock_1(gsheet))
             max_price = float(row.product.max_price_stock_1(gsheet))
-            offer_items_copy[0].price = max_price
+            adjusted_price = max_price
         elif stock_type is StockType.stock_2:
             max_price = float(row.product.max_price_stock_2(gsheet))
             min_price = float(row.product.min_price_stock_2(gsheet))
-            offer_items_copy[0].price = max_price
+            adjusted_price = max_price
         elif stock_type is StockType.stock_fake:
             min_price = float(row.product.get_stock_fake_min_price())
             max_price = float(row.product.get_stock_fake_max_price())
-            offer_items_copy[0].price = max_price
+            adjusted_price = max_price
 
-        if offer_items_copy[0].price == max_price:
+        if adjusted_price == max_price:
             return None, None
 
         return PriceInfo(
             price_min=min_price,
             price_mac=max_price,
-            adjusted_price=offer_items_copy[0].price,
-            offer_item=offer_items_copy[0],
+            adjusted_price=adjusted_price,
+            offer_item=offer_items[0].with_price(adjusted_price),
             stock_type=stock_type,
             range_adjust=None,
             stock_num_info=stock_num_info,
@@ -210,24 +194,26 @@ def calculate_price_change(
 
 
     # Ensure min_offer_item is valid before proceeding
-    valid_filtered_offer_items = filter_valid_offer_items(
-        row.product,
-        offer_items_copy,  # Use the copy for filtering
-        black_list=black_list
-    )
+    # Filters and picks run on the offer book (NumPy arrays for large pages), same results as the per-item helpers
+    offer_book = offer_book_for_page(offer_items)
+    valid_mask = offer_book.valid_mask(OfferFilter(row.product, black_list))
+    valid_filtered_offer_items = offer_book.select(valid_mask)
     if not valid_filtered_offer_items:
         # print("No valid offer items after initial filtering for min_offer_item.")
         return None  # Cannot proceed without a base offer item
 
-    min_offer_item = OfferItem.min_offer_item(valid_filtered_offer_items)
+    min_offer_index = offer_book.min_offer_index(valid_mask)
+    min_offer_item = offer_items[min_offer_index]
 
     if min_offer_item is None or min_offer_item.quantity == 0:  # Check for None and zero quantity
         # print("Min offer item is None or has zero quantity.")
         return None
 
     _ref_seller = min_offer_item.seller.name
-    min_offer_item.price = min_offer_item.price / min_offer_item.quantity  # Price per unit
-    _ref_price = min_offer_item.price
+    min_unit_price = min_offer_item.unit_price  # Price per unit
+    # The min offer is priced per unit from here on, also where it is compared with the other offers
+    offer_book.update_price(min_offer_index, min_unit_price)
+    _ref_price = min_unit_price
     stock_fake_items = None
 
     product_min_price: float = -1.0
@@ -260,20 +246,14 @@ def calculate_price_change(
         range_adjust = random.uniform(row.product.DONGIAGIAM_MIN, row.product.DONGIAGIAM_MAX)
 
         if int(product_min_price) == -1 and int(product_max_price) == -1:
-            # Filter items not in blacklist for finding closest if no min/max defined
-            valid_offers_for_closest = [item for item in valid_filtered_offer_items if
-                                        item.seller.name not in black_list and item.quantity > 0]
-            if not valid_offers_for_closest:
+            # Find offer item closest to stock_fake_price_value (competitor price), blacklist excluded
+            closest_index = offer_book.closest_to_unit_price(valid_mask, stock_fake_price_value, black_list)
+            if closest_index is None:
                 # print("No valid offers to find closest when stock_fake min/max are -1.")
                 return None  # Cannot determine price
 
-            # Find offer item closest to stock_fake_price_value (competitor price)
-            closest_offer_to_competitor = min(
-                valid_offers_for_closest,
-                key=lambda item: abs((item.price / item.quantity) - stock_fake_price_value)
-            )
             adjusted_price = round(
-                (closest_offer_to_competitor.price / closest_offer_to_competitor.quantity) - range_adjust,
+                offer_book.effective_unit_price(closest_index) - range_adjust,
                 row.product.DONGIA_LAMTRON,
             )
             # Ensure our price is at least the competitor's price (or our calculated version of it)
@@ -293,7 +273,7 @@ def calculate_price_change(
         # General clamping based on our own product's min_offer_item and defined fake_stock min/max
         # Ensure adjusted_price is not below our own min_offer_item's price (minus an adjustment)
         # And not below the product_min_price for stock_fake
-        lower_bound_candidate = min_offer_item.price - range_adjust  # Potential price based on our cheapest valid offer
+        lower_bound_candidate = min_unit_price - range_adjust  # Potential price based on our cheapest valid offer
 
         current_lower_bound = lower_bound_candidate
         if product_min_price != -1.0:
@@ -307,13 +287,9 @@ def calculate_price_change(
         adjusted_price = round(adjusted_price, row.product.DONGIA_LAMTRON)
 
         # Attempt to undercut a slightly higher priced seller
-        # Sort by price per unit
-        sorted_valid_offers = sorted([item for item in valid_filtered_offer_items if item.quantity > 0],
-                                     key=lambda item: item.price / item.quantity)
-
         _profit_margin_for_undercut = random.uniform(row.product.DONGIAGIAM_MIN, row.product.DONGIAGIAM_MAX)
-        closest_price, closest_seller = get_closest_offer_item(sorted_valid_offers, adjusted_price,
-                                                               _profit_margin_for_undercut, black_list)
+        closest_price, closest_seller = offer_book.closest_offer(valid_mask, adjusted_price,
+                                                                 _profit_margin_for_undercut, black_list)
 
         if closest_price != -1 and closest_price > 0:  # Ensure positive price
             adjusted_price = closest_price
@@ -334,7 +310,7 @@ def calculate_price_change(
             price_min=_display_min_price,
             price_mac=_display_max_price,
             adjusted_price=adjusted_price,
-            offer_item=min_offer_item,  # This is the original min_offer_item (price per unit)
+            offer_item=min_offer_item.with_price(min_unit_price),  # min_offer_item priced per unit
             stock_type=stock_type,
             stock_num_info=stock_num_info,
             ref_seller=_ref_seller,
@@ -347,13 +323,13 @@ def calculate_price_change(
     )
 
     # Initial adjusted price based on min_offer_item and product's own min/max for this stock type
-    if product_min_price != -1.0 and min_offer_item.price < product_min_price:
+    if product_min_price != -1.0 and min_unit_price < product_min_price:
         adjusted_price = product_min_price
-    elif product_max_price != -1.0 and min_offer_item.price > product_max_price:
+    elif product_max_price != -1.0 and min_unit_price > product_max_price:
         adjusted_price = product_max_price
-    else:  # min_offer_item.price is within bounds, or bounds are not set
+    else:  # min_unit_price is within bounds, or bounds are not set
         adjusted_price = round(
-            min_offer_item.price - range_adjust,  # Undercut our own cheapest offer slightly
+            min_unit_price - range_adjust,  # Undercut our own cheapest offer slightly
             row.product.DONGIA_LAMTRON,
         )
 
@@ -361,7 +337,7 @@ def calculate_price_change(
     # Ensure adjusted_price is not below (our min_offer_item - range_adjust)
     # And also not below the defined product_min_price for this stock type
 
-    lower_bound_candidate_stock12 = min_offer_item.price - range_adjust
+    lower_bound_candidate_stock12 = min_unit_price - range_adjust
     current_lower_bound_stock12 = lower_bound_candidate_stock12
     if product_min_price != -1.0:
         current_lower_bound_stock12 = max(lower_bound_candidate_stock12, product_min_price)
@@ -374,12 +350,9 @@ def calculate_price_change(
     adjusted_price = round(adjusted_price, row.product.DONGIA_LAMTRON)
 
     # Attempt to undercut a slightly higher priced seller from the general offers list
-    # Sort by price per unit
-    sorted_valid_offers_stock12 = sorted([item for item in valid_filtered_offer_items if item.quantity > 0],
-                                         key=lambda item: item.price / item.quantity)
     _profit_margin_for_undercut_stock12 = random.uniform(row.product.DONGIAGIAM_MIN, row.product.DONGIAGIAM_MAX)
-    closest_price, closest_seller = get_closest_offer_item(sorted_valid_offers_stock12, adjusted_price,
-                                                           _profit_margin_for_undercut_stock12, black_list)
+    closest_price, closest_seller = offer_book.closest_offer(valid_mask, adjusted_price,
+                                                             _profit_margin_for_undercut_stock12, black_list)
 
     if closest_price != -1 and closest_price > 0:  # Ensure positive price
         adjusted_price = closest_price
@@ -400,7 +373,7 @@ def calculate_price_change(
         price_min=_display_product_min_price,
         price_mac=_display_product_max_price,
         adjusted_price=adjusted_price,
-        offer_item=min_offer_item,  # This is the original min_offer_item (price per unit)
+        offer_item=min_offer_item.with_price(min_unit_price),  # min_offer_item priced per unit
         stock_type=stock_type,
         range_adjust=range_adjust,  # This might be the initial range_adjust
         stock_num_info=stock_num_info,
@@ -420,31 +393,3 @@ def g2g_lowest_price(
         g2g.get_g2g_price(),
     )
     return G2GOfferItem.min_offer_item(filtered_g2g_offer_items)
-
-
-def get_closest_offer_item(
-        sorted_offer_items: list[OfferItem],
-        price: float,
-        profit: float,
-        black_list: list[str]
-):
-    if len(sorted_offer_items) >= 1:
-        if price < sorted_offer_items[0].price:
-            return -1, "Keep"
-    # Filter offer items that have a price above the target price
-    above_price_items = [item for item in sorted_offer_items if (item.price / item.quantity) > price and item.seller.name not in black_list]
-
-    if not above_price_items:
-        # If no items are above the target price, return the item with the highest price
-        closest_item = max(sorted_offer_items, key=lambda item: item.price / item.quantity)
-    else:
-        # Find the item with the lowest price among those above the target price
-        closest_item = min(above_price_items, key=lambda item: item.price / item.quantity)
-
-    # Create a copy of the closest item
-    adjusted_item = copy.deepcopy(closest_item)
-
-    # Adjust the price by the profit factor
-    adjusted_item.price = (adjusted_item.price / adjusted_item.quantity) - profit
-
-    return adjusted_item.price , adjusted_item.seller.name
@@ -2,6 +2,8 @@ import os
 
 KEY_PATH = "key.json"
 DATA_PATH = "storage/output.json"
+HOST_CATALOG_PATH = "storage/host_catalog.db"
+PA_PARITY_PAGES_PATH = "storage/pa_parity_pages"
 RETRIES_TIME = 20
 DEFAULT_URL = "https://www.bijiaqi.com/"
 
@@ -9,6 +11,8 @@ SHEET_NAME = "Sheet1"
 BLACKLIST_SHEET_NAME = "Blacklist"
 DESTINATION_RANGE = "G{n}:Q{n}"
 INFORMATION_RANGE = "G{n}:H{n}"
+SNAPSHOT_FIRST_COLUMN = "B"
+SNAPSHOT_LAST_COLUMN = "CK"
 TIMEOUT = 15
 REFRESH_TIME = 10
 LOG_FILE = "function_calls.log"
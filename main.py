@@ -11,26 +11,39 @@ import constants
 from QueryCurrency import query_currency
 from QueryItem import query_item
 from app.login import login
-from app.process import calculate_price_change, is_change_price, get_row_run_index
+from app.pipeline import Pipeline, Stage
+from app.pricing_engine import PriceLadder, offer_filter_stats, reset_offer_filter_stats
+from app.process import calculate_price_change, is_change_price, get_row_run_index, \
+    get_row_run_index_from_snapshot
 from decorator.retry import retry
 from decorator.time_execution import time_execution
 from model.crawl_model import OfferItem
 from model.enums import StockType
-from model.payload import Row, PriceInfo
+from model.payload import Row, PriceInfo, RowCache
 from model.sheet_model import ExtraInfor
 from utils.excel_util import CurrencyTemplate, currency_templates_to_dicts, item_templates_to_dicts, ItemTemplate, \
     create_file_from_template, clear_output_directory
+from utils.common_utils import cny_rate_reference
 from utils.exceptions import PACrawlerError
+from utils.fetch_cache import get_pa_fetch_cache
 from utils.ggsheet import GSheet, Sheet
+from utils.host_catalog import get_host_catalog
+from utils.log_writer import LogCellBuffer
 from utils.logger import setup_logging
-from utils.pa_extract import extract_offer_items
-from utils.selenium_util import SeleniumUtil
+from utils.pa_extract import extract_offer_items_pooled, pa_fetch_stats, seed_pa_session
+from utils.rate_limiter import get_sheets_limiter
+from utils.selenium_util import SeleniumUtil, SeleniumPool
+from utils.sheet_backend import get_sheet_backend
+from utils.sheet_operator import read_worksheet_snapshot
+from utils.sheet_reference import ReferenceResolver
+from utils.ttl_cache import get_reference_cache
 
 ### SETUP ###
 load_dotenv("settings.env")
 
 setup_logging()
-gs = GSheet()
+gs = get_sheet_backend().gsheet()
+row_cache = RowCache()
 
 
 ### FUNCTIONS ###
@@ -59,11 +72,11 @@ def read_file_with_encoding(file_path, encoding='utf-8'):
 def process(
         BIJ_HOST_DATA: dict,
         gsheet: GSheet,
-        browser_list: List[SeleniumUtil]
+        browser_list: List[SeleniumUtil],
+        pa_pool: SeleniumPool,
 ):
     print("process")
     browser = browser_list[0]
-    normal_browser = browser_list[1]
     try:
         sheet = Sheet.from_sheet_id(
             gsheet=gsheet,
@@ -77,97 +90,177 @@ def process(
     except Exception as e:
         print(f"Error getting worksheet: {e}")
         return
-    row_indexes = get_row_run_index(worksheet=worksheet)
+    snapshot = None
+    if os.getenv("SNAPSHOT_MODE", "1") == "1":
+        snapshot = read_worksheet_snapshot(
+            worksheet, constants.SNAPSHOT_FIRST_COLUMN, constants.SNAPSHOT_LAST_COLUMN
+        )
+        row_indexes = get_row_run_index_from_snapshot(snapshot)
+    else:
+        row_indexes = get_row_run_index(worksheet=worksheet)
+
+    rows: dict[int, Row | Exception] = {}
+    for index in row_indexes:
+        try:
+            if snapshot is not None:
+                rows[index] = row_cache.get_row(worksheet, snapshot, index)
+            else:
+                rows[index] = Row.from_row_index(worksheet, index)
+        except Exception as e:
+            rows[index] = e
+    if snapshot is not None:
+        row_cache.retain(row_indexes)
+        print(f"Row cache: {row_cache.hits} hits, {row_cache.misses} misses")
+
+    resolver = ReferenceResolver()
+    resolver.add(*cny_rate_reference(), kind="cny_rate")
+    for row in rows.values():
+        if isinstance(row, Row):
+            resolver.add_references(row.sheet_references())
+            row.attach_resolver(resolver)
+    resolver.resolve()
+    print(f"Reference cache: {get_reference_cache().stats()}")
+
+    get_pa_fetch_cache().new_cycle()
+    reset_offer_filter_stats()
 
     currency_template = []
     item_template = []
 
-    for index in row_indexes:
+    log_buffer = LogCellBuffer(
+        worksheet,
+        flush_rows=int(os.getenv("LOG_FLUSH_ROWS", 20)),
+        flush_seconds=float(os.getenv("LOG_FLUSH_SECONDS", 60)),
+    )
+
+    def fetch_stage(index: int):
         print(f"Row: {index}")
         try:
-            row = Row.from_row_index(worksheet, index)
+            row = rows[index]
+            if isinstance(row, Exception):
+                raise row
             pa_blacklist = row.stock_info.get_pa_blacklist()
         except Exception as e:
             print(f"Error getting row: {e}")
             _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            write_to_log_cell(worksheet, index, "Error: " + _current_time, log_type="time")
-            continue
+            write_to_log_cell(log_buffer, index, "Error: " + _current_time, log_type="time")
+            return None
         if not isinstance(row, Row):
-            continue
-        offer_items = extract_offer_items(row.product.PRODUCT_COMPARE, normal_browser)
-        sorted_offer_items = sorted(offer_items, key=lambda x: x.price)
-        item_info, stock_fake_items = None, None
-        if True:
-            try:
-                [item_info, stock_fake_items] = calculate_price_change(
-                    gsheet, row, offer_items, BIJ_HOST_DATA, browser, pa_blacklist
-                )
-                if item_info is None:
-                    print("No item info")
-                    continue
-            except Exception as e:
-                print(f"Error calculating price change: {e}")
-                continue
-            row.extra = correct_extra_data(row.extra)
-            final_stock = row.stock_info.cal_stock()
-            if "SPECIAL" in row.product.Product_link:
-                _id_list = row.extra.get_game_list()
-                for _id in _id_list:
-                    if "C" in _id:
-                        _currency_info = query_currency("storage/joined_data.db", _id)
-                        currency_template.append(
-                            CurrencyTemplate(
-                                game=_currency_info.Game,
-                                server=_currency_info.Server,
-                                faction=_currency_info.Faction,
-                                currency_per_unit=row.extra.CURRENCY_PER_UNIT,
-                                total_units=min(final_stock, 10000),
-                                minimum_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
-                                price_per_unit=float(
-                                    f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.3f}"),
-                                ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
-                                discount=row.extra.DISCOUNT,
-                                title=row.product.TITLE,
-                                duration=row.product.DURATION,
-                                delivery_guarantee=row.extra.DELIVERY_GUARANTEE,
-                                description=row.product.DESCRIPTION,
-                            )
-                        )
-                    else:
-                        _item_info = query_item("storage/joined_data.db", _id)
-                        item_template.append(
-                            ItemTemplate(
-                                game=_item_info.game,
-                                server=_item_info.server,
-                                faction=_item_info.faction,
-                                item_category1=_item_info.item_category1,
-                                item_category2=_item_info.item_category2,
-                                item_category3=_item_info.item_category3,
-                                item_per_unit=row.extra.CURRENCY_PER_UNIT,
-                                unit_price=float(
-                                    f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.2f}"),
-                                min_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
-                                ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
-                                discount=row.extra.DISCOUNT,
-                                offer_duration=row.product.DURATION,
-                                delivery_guarantee=row.extra.DELIVERY_GUARANTEE,
-                                delivery_info='',
-                                cover_image='',
-                                title=row.product.TITLE,
-                                description=row.product.DESCRIPTION,
-                            )
-                        )
-            elif "C" in row.product.Product_link:
-                _currency_info = query_currency("storage/joined_data.db", row.product.Product_link)
-                currency_template.append(
+            return None
+        offer_items = extract_offer_items_pooled(row.product.PRODUCT_COMPARE, pa_pool)
+        return index, row, pa_blacklist, offer_items
+
+    def price_stage(job):
+        index, row, pa_blacklist, offer_items = job
+        try:
+            [item_info, stock_fake_items] = calculate_price_change(
+                gsheet, row, offer_items, BIJ_HOST_DATA, browser, pa_blacklist
+            )
+            if item_info is None:
+                print("No item info")
+                return None
+        except Exception as e:
+            print(f"Error calculating price change: {e}")
+            return None
+        return index, row, offer_items, item_info, stock_fake_items
+
+    def emit_stage(job):
+        index, row, offer_items, item_info, stock_fake_items = job
+        price_ladder = PriceLadder.by_total_price(offer_items)
+        cheapest_offer_item = price_ladder.top(1)[0]
+        row.extra = correct_extra_data(row.extra)
+        currency_templates, item_templates = build_templates(row, item_info)
+
+        print(f"Price change:\n{item_info.model_dump(mode='json')}")
+        log_str = ""
+        for offer_item in offer_items:
+            if not offer_item.seller.canGetFeedback:
+                log_str += f"Can't get feedback from {offer_item.seller.name}\n"
+        log_str += get_update_str(cheapest_offer_item, item_info, stock_fake_items, row.product.DONGIA_LAMTRON)
+        log_str += get_top_pa_offers_str(price_ladder, cheapest_offer_item, row.product.DONGIA_LAMTRON)
+        write_to_log_cell(log_buffer, index, log_str)
+        _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        write_to_log_cell(log_buffer, index, _current_time, log_type="time")
+        print("Next row...")
+        return index, currency_templates, item_templates
+
+    # Errors that used to stop the row loop still fail the cycle, once the other rows are done
+    stage_errors: list[Exception] = []
+
+    def on_stage_error(stage: Stage, job, e: Exception):
+        print(f"Error in {stage.name} stage: {e}")
+        stage_errors.append(e)
+
+    # Rows overlap: PA pages of some rows load while others are priced and logged
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch_stage, workers=int(os.getenv("PIPELINE_FETCH_WORKERS") or 4)),
+            Stage("price", price_stage, workers=int(os.getenv("PIPELINE_PRICE_WORKERS", 2))),
+            Stage("emit", emit_stage, workers=int(os.getenv("PIPELINE_EMIT_WORKERS", 2))),
+        ],
+        queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", 8)),
+        on_error=on_stage_error,
+    )
+    try:
+        results = pipeline.run(row_indexes)
+    finally:
+        log_buffer.flush()
+        print(f"Log cells: {log_buffer.write_count} writes in {log_buffer.request_count} requests, "
+              f"saved {log_buffer.saved_requests} requests")
+        print(f"Sheets limiter: {get_sheets_limiter().stats()}")
+        print(f"PA pages: sources {pa_fetch_stats()}, cache {get_pa_fetch_cache().stats()}")
+        print(f"Pipeline: {pipeline.stats()}")
+        print(f"PA offer filter (this cycle, per pricing attempt): {offer_filter_stats()}")
+    if stage_errors:
+        raise stage_errors[0]
+
+    # Templates keep the row order of the sheet
+    for _, currency_templates, item_templates in sorted(results, key=lambda result: result[0]):
+        currency_template.extend(currency_templates)
+        item_template.extend(item_templates)
+
+    currency_template = currency_templates_to_dicts(currency_template)
+    is_have_item = False
+    if len(item_template) > 0:
+        is_have_item = True
+        item_template = item_templates_to_dicts(item_template)
+    clear_output_directory("storage/output/item")
+    clear_output_directory("storage/output/currency")
+    create_file_from_template("currency_template.xlsx", "storage/output/currency/new_currency_file.xlsx",
+                              currency_template)
+    create_file_from_template("item_template.xlsx", "storage/output/item/new_item_file.xlsx",
+                              item_template)
+    print("Create file successfully, check storage/output folder")
+
+    try:
+        normal_browser = SeleniumUtil(mode=1)
+        upload_data_to_site(normal_browser, is_have_item)
+    except Exception as _e:
+        raise PACrawlerError(f"Error uploading data to site: {_e}")
+
+
+def build_templates(
+        row: Row,
+        item_info: PriceInfo,
+) -> tuple[list[CurrencyTemplate], list[ItemTemplate]]:
+    currency_templates = []
+    item_templates = []
+    final_stock = row.stock_info.cal_stock()
+    if "SPECIAL" in row.product.Product_link:
+        _id_list = row.extra.get_game_list()
+        for _id in _id_list:
+            if "C" in _id:
+                _currency_info = query_currency("storage/joined_data.db", _id)
+                currency_templates.append(
                     CurrencyTemplate(
                         game=_currency_info.Game,
                         server=_currency_info.Server,
                         faction=_currency_info.Faction,
                         currency_per_unit=row.extra.CURRENCY_PER_UNIT,
-                        total_units=min(final_stock, 9999),
+                        total_units=min(final_stock, 10000),
                         minimum_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
-                        price_per_unit=float(f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.3f}"),
+                        price_per_unit=float(
+                            f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.3f}"),
                         ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
                         discount=row.extra.DISCOUNT,
                         title=row.product.TITLE,
@@ -177,8 +270,8 @@ def process(
                     )
                 )
             else:
-                _item_info = query_item("storage/joined_data.db", row.product.Product_link)
-                item_template.append(
+                _item_info = query_item("storage/joined_data.db", _id)
+                item_templates.append(
                     ItemTemplate(
                         game=_item_info.game,
                         server=_item_info.server,
@@ -187,8 +280,8 @@ def process(
                         item_category2=_item_info.item_category2,
                         item_category3=_item_info.item_category3,
                         item_per_unit=row.extra.CURRENCY_PER_UNIT,
-                        unit_price=float(f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.2f}"),
-                        total_units=min(final_stock, 9999),
+                        unit_price=float(
+                            f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.2f}"),
                         min_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
                         ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
                         discount=row.extra.DISCOUNT,
@@ -200,40 +293,50 @@ def process(
                         description=row.product.DESCRIPTION,
                     )
                 )
-
-            print(f"Price change:\n{item_info.model_dump(mode='json')}")
-            log_str = ""
-            for offer_item in offer_items:
-                if not offer_item.seller.canGetFeedback:
-                    log_str += f"Can't get feedback from {offer_item.seller.name}\n"
-            log_str += get_update_str(sorted_offer_items[0], item_info, stock_fake_items, row.product.DONGIA_LAMTRON)
-            log_str += get_top_pa_offers_str(sorted_offer_items, sorted_offer_items[0], row.product.DONGIA_LAMTRON)
-            write_to_log_cell(worksheet, index, log_str)
-            _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            write_to_log_cell(worksheet, index, _current_time, log_type="time")
-        # else:
-        #     print("No valid offer item")
-        #     _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S") + "\nNo valid offer item\n"
-        #     write_to_log_cell(worksheet, index, _current_time, log_type="time")
-        print("Next row...")
-    currency_template = currency_templates_to_dicts(currency_template)
-    is_have_item = False
-    if len(item_template) > 0:
-        is_have_item = True
-        item_template = item_templates_to_dicts(item_template)
-    clear_output_directory("storage/output/item")
-    clear_output_directory("storage/output/currency")
-    create_file_from_template("currency_template.xlsx", "storage/output/currency/new_currency_file.xlsx",
-                              currency_template)
-    create_file_from_template("item_template.xlsx", "storage/output/item/new_item_file.xlsx",
-                              item_template)
-    print("Create file successfully, check storage/output folder")
-
-    try:
-        normal_browser = SeleniumUtil(mode=1)
-        upload_data_to_site(normal_browser, is_have_item)
-    except Exception as _e:
-        raise PACrawlerError(f"Error uploading data to site: {_e}")
+    elif "C" in row.product.Product_link:
+        _currency_info = query_currency("storage/joined_data.db", row.product.Product_link)
+        currency_templates.append(
+            CurrencyTemplate(
+                game=_currency_info.Game,
+                server=_currency_info.Server,
+                faction=_currency_info.Faction,
+                currency_per_unit=row.extra.CURRENCY_PER_UNIT,
+                total_units=min(final_stock, 9999),
+                minimum_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
+                price_per_unit=float(f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.3f}"),
+                ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
+                discount=row.extra.DISCOUNT,
+                title=row.product.TITLE,
+                duration=row.product.DURATION,
+                delivery_guarantee=row.extra.DELIVERY_GUARANTEE,
+                description=row.product.DESCRIPTION,
+            )
+        )
+    else:
+        _item_info = query_item("storage/joined_data.db", row.product.Product_link)
+        item_templates.append(
+            ItemTemplate(
+                game=_item_info.game,
+                server=_item_info.server,
+                faction=_item_info.faction,
+                item_category1=_item_info.item_category1,
+                item_category2=_item_info.item_category2,
+                item_category3=_item_info.item_category3,
+                item_per_unit=row.extra.CURRENCY_PER_UNIT,
+                unit_price=float(f"{item_info.adjusted_price * float(row.extra.CURRENCY_PER_UNIT):.2f}"),
+                total_units=min(final_stock, 9999),
+                min_unit_per_order=row.extra.MIN_UNIT_PER_ORDER,
+                ValueForDiscount=row.extra.VALUE_FOR_DISCOUNT,
+                discount=row.extra.DISCOUNT,
+                offer_duration=row.product.DURATION,
+                delivery_guarantee=row.extra.DELIVERY_GUARANTEE,
+                delivery_info='',
+                cover_image='',
+                title=row.product.TITLE,
+                description=row.product.DESCRIPTION,
+            )
+        )
+    return currency_templates, item_templates
 
 
 def correct_extra_data(extra: ExtraInfor) -> ExtraInfor:
@@ -250,12 +353,12 @@ def upload_data_to_site(browser: SeleniumUtil, isHaveItem: bool):
 
 ### LOG FUNC ###
 def get_top_pa_offers_str(
-        sorted_offer_items: list[OfferItem]
+        price_ladder: PriceLadder
         , offer_item: OfferItem
         , round_num
 ) -> str:
     _str = "Top 3 PA offers:\n"
-    for i, item in enumerate(sorted_offer_items[:3]):
+    for i, item in enumerate(price_ladder.top(3)):
         if i == 0:
             _str += f"{i + 1}: {item.seller.name}: {round(item.price / offer_item.quantity, round_num):.{round_num}f}\n"
             continue
@@ -315,6 +418,9 @@ def write_to_log_cell(
         log_str,
         log_type="log"
 ):
+    if isinstance(worksheet, LogCellBuffer):
+        worksheet.write(row_index, log_str, log_type=log_type)
+        return
     try:
         r, c = None, None
         if log_type == "log":
@@ -332,15 +438,21 @@ def write_to_log_cell(
 
 if __name__ == "__main__":
     print("Starting...")
-    BIJ_HOST_DATA = read_file_with_encoding(constants.DATA_PATH, encoding='utf-8')
-    gsheet = GSheet(constants.KEY_PATH)
-    headless_browser = SeleniumUtil(mode=2)
+    BIJ_HOST_DATA = get_host_catalog()
+    gsheet = get_sheet_backend().gsheet(constants.KEY_PATH)
+    headless_browser = SeleniumUtil(mode=2, profile=os.getenv("HEADLESS_BROWSER_PROFILE", "scrape"))
     normal_browser = SeleniumUtil(mode=1)
     normal_browser.driver.minimize_window()
+    seed_pa_session(normal_browser)
     browser_list = [headless_browser, normal_browser]
+    _pool_size = int(os.getenv("PA_BROWSER_POOL_SIZE", 0))
+    if _pool_size > 0:
+        pa_pool = SeleniumPool(_pool_size, mode=2)
+    else:
+        pa_pool = SeleniumPool(mode=1, browsers=[normal_browser], profile="default")
     while True:
         try:
-            process(BIJ_HOST_DATA, gsheet, browser_list)
+            process(BIJ_HOST_DATA, gsheet, browser_list, pa_pool)
             try:
                 _time_sleep = float(os.getenv("TIME_SLEEP"))
             except Exception:
@@ -1,6 +1,7 @@
+import math
 import re
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 from enum import Enum
 from .sheet_model import G2G, FUN
 
@@ -33,6 +34,9 @@ class DeliveryTime(BaseModel):
             return self.value * 60 * 60
         return self.value * 60
 
+    def seconds(self) -> int:
+        return self.__to_seconds()
+
     def __gt__(self, orther: "DeliveryTime"):
         return self.__to_seconds() > orther.__to_seconds()
 
@@ -61,6 +65,13 @@ class DeliveryTime(BaseModel):
 
 
 class OfferItem(BaseModel):
+    """
+    One scraped PA offer. Offers are shared by every row that reads the same page,
+    so they are frozen; use with_price() for a re-priced copy.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
     offer_id: str
     server: str
     seller: Seller | None
@@ -70,6 +81,22 @@ class OfferItem(BaseModel):
     quantity: int
     price: float
 
+    _unit_price: float = PrivateAttr(default=math.inf)
+
+    def model_post_init(self, __context) -> None:
+        if self.quantity:
+            self._unit_price = self.price / self.quantity
+
+    @property
+    def unit_price(self) -> float:
+        """
+        price / quantity, computed once; inf for an offer without quantity.
+        """
+        return self._unit_price
+
+    def with_price(self, price: float) -> "OfferItem":
+        return OfferItem(**{**dict(self), "price": price})
+
     @staticmethod
     def min_offer_item(
         offer_items: list["OfferItem"],
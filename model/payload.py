@@ -1,3 +1,4 @@
+import hashlib
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -6,7 +7,9 @@ from pydantic import BaseModel, ConfigDict
 
 from model.crawl_model import OfferItem, StockNumInfo
 from model.enums import StockType
-from utils.sheet_operator import query_multi_model_from_worksheet
+import constants
+from utils.log_writer import LOG_COLUMNS
+from utils.sheet_operator import query_multi_model_from_worksheet, query_multi_model_from_snapshot, column_index
 from .sheet_model import Product, StockInfo, G2G, FUN, BIJ, ExtraInfor, DD
 
 
@@ -116,6 +119,21 @@ class Row:
         self.bij = bij
         self.extra = extra
         self.dd = dd
+        self.resolver = None
+
+    def models(self) -> list:
+        return [self.product, self.stock_info, self.g2g, self.fun, self.bij, self.extra, self.dd]
+
+    def sheet_references(self) -> list[tuple[str, str, str | None]]:
+        references = []
+        for model in self.models():
+            references.extend(model.sheet_references())
+        return references
+
+    def attach_resolver(self, resolver) -> None:
+        self.resolver = resolver
+        for model in self.models():
+            model._resolver = resolver
 
     @staticmethod
     def from_row_index(
@@ -133,6 +151,84 @@ class Row:
         except Exception as e:
             raise Exception(f"Error getting row: {e}")
 
+    @staticmethod
+    def from_snapshot(
+            worksheet,
+            snapshot: list[list[str]],
+            row_index: int,
+    ) -> "Row":
+        try:
+            return Row(
+                row_index,
+                worksheet,
+                *query_multi_model_from_snapshot(
+                    snapshot,
+                    [Product, StockInfo, G2G, FUN, BIJ, ExtraInfor, DD],
+                    row_index,
+                    constants.SNAPSHOT_FIRST_COLUMN,
+                ),  # type: ignore
+            )
+        except Exception as e:
+            raise Exception(f"Error getting row: {e}")
+
+
+class RowCache:
+    """
+    Keeps the validated Row of each sheet row between cycles together with a hash of
+    its config cells, so only rows whose config changed are validated again.
+    The log, time and error columns are left out of the hash because the tool
+    rewrites them every cycle.
+    """
+
+    def __init__(self):
+        self._rows: dict[int, tuple[str, Row]] = {}
+        self._skip_offsets = {
+            column_index(column) - column_index(constants.SNAPSHOT_FIRST_COLUMN)
+            for column in LOG_COLUMNS.values()
+        }
+        self.hits = 0
+        self.misses = 0
+
+    def _row_hash(self, row_values: list[str]) -> str:
+        config_values = [
+            value for offset, value in enumerate(row_values) if offset not in self._skip_offsets
+        ]
+        return hashlib.blake2b("\x1f".join(config_values).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_row(
+            self,
+            worksheet,
+            snapshot: list[list[str]],
+            row_index: int,
+    ) -> Row:
+        row_values = snapshot[row_index - 1] if row_index <= len(snapshot) else []
+        row_hash = self._row_hash(row_values)
+        cached = self._rows.get(row_index)
+        if cached is not None and cached[0] == row_hash:
+            self.hits += 1
+            row = cached[1]
+            row.worksheet = worksheet
+            # Note and Last_Update are not part of the hash, refresh them from the snapshot
+            first_column_index = column_index(constants.SNAPSHOT_FIRST_COLUMN)
+            for field_name in ("Note", "Last_Update"):
+                offset = column_index(Product.model_fields[field_name].metadata[0]) - first_column_index
+                value = row_values[offset] if offset < len(row_values) else None
+                setattr(row.product, field_name, value if value != "" else None)
+            return row
+        self.misses += 1
+        row = Row.from_snapshot(worksheet, snapshot, row_index)
+        self._rows[row_index] = (row_hash, row)
+        return row
+
+    def retain(self, row_indexes: list[int]) -> None:
+        """
+        Forget rows that are no longer active.
+        """
+        active = set(row_indexes)
+        for row_index in list(self._rows):
+            if row_index not in active:
+                del self._rows[row_index]
+
 
 class PriceInfo(BaseModel):
     price_min: float
@@ -1,14 +1,17 @@
-from typing import Annotated
+from typing import Annotated, Any, ClassVar
 
 from pydantic import BaseModel
 from pydantic.fields import FieldInfo
 
 from utils.ggsheet import GSheet
-from utils.google_api import StockManager
+from utils.google_api import StockManager, submit_read
 
 
 class BaseGSheetModel(BaseModel):
     row_index: int | None = None
+    # (IDSHEET, SHEET, CELL, cache kind) of the cells this model reads from other spreadsheets
+    REFERENCE_FIELDS: ClassVar[list[tuple[str, str, str, str | None]]] = []
+    _resolver: Any = None
 
     @classmethod
     def fields_exclude_row_index(
@@ -20,6 +23,19 @@ class BaseGSheetModel(BaseModel):
                 dic[k] = v
         return dic
 
+    def sheet_references(self) -> list[tuple[str, str, str | None]]:
+        references = []
+        for id_field, sheet_field, cell_field, kind in self.REFERENCE_FIELDS:
+            spreadsheet_id = getattr(self, id_field)
+            sheet = getattr(self, sheet_field)
+            cell = getattr(self, cell_field)
+            if spreadsheet_id and sheet and cell:
+                references.append((spreadsheet_id, f"'{sheet}'!{cell}", kind))
+        return references
+
+    def _stock_manager(self, spreadsheet_id: str) -> StockManager:
+        return StockManager(spreadsheet_id, resolver=self._resolver)
+
 
 class Product(BaseGSheetModel):
     CHECK: Annotated[int, "B"]
@@ -60,12 +76,21 @@ class Product(BaseGSheetModel):
     SHEET_MIN_STOCKFAKE: Annotated[str | None, "CA"] = ''
     CELL_MIN_STOCKFAKE: Annotated[str | None, "CB"] = ''
 
+    REFERENCE_FIELDS = [
+        ("IDSHEET_MIN", "SHEET_MIN", "CELL_MIN", None),
+        ("IDSHEET_MAX", "SHEET_MAX", "CELL_MAX", None),
+        ("IDSHEET_MIN2", "SHEET_MIN2", "CELL_MIN2", None),
+        ("IDSHEET_MAX2", "SHEET_MAX2", "CELL_MAX2", None),
+        ("IDSHEET_MIN_STOCKFAKE", "SHEET_MIN_STOCKFAKE", "CELL_MIN_STOCKFAKE", None),
+        ("IDSHEET_MAX_STOCKFAKE", "SHEET_MAX_STOCKFAKE", "CELL_MAX_STOCKFAKE", None),
+    ]
+
     def min_price_stock_1(
             self,
             gsheet: GSheet,
     ) -> float:
         try:
-            sheet_manager = StockManager(self.IDSHEET_MIN)
+            sheet_manager = self._stock_manager(self.IDSHEET_MIN)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.SHEET_MIN}'!{self.CELL_MIN}")
             # sheet = Sheet.from_sheet_id(gsheet, self.IDSHEET_MIN)
             # worksheet = sheet.open_worksheet(self.SHEET_MIN)
@@ -81,7 +106,7 @@ class Product(BaseGSheetModel):
             gsheet: GSheet,
     ) -> float:
         try:
-            sheet_manager = StockManager(self.IDSHEET_MAX)
+            sheet_manager = self._stock_manager(self.IDSHEET_MAX)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.SHEET_MAX}'!{self.CELL_MAX}")
             return float(cell_value)  # type: ignore
         except Exception as e:
@@ -93,7 +118,7 @@ class Product(BaseGSheetModel):
             gsheet: GSheet,
     ) -> float:
         try:
-            sheet_manager = StockManager(self.IDSHEET_MIN2)
+            sheet_manager = self._stock_manager(self.IDSHEET_MIN2)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.SHEET_MIN2}'!{self.CELL_MIN2}")
             return float(cell_value)  # type: ignore
         except Exception as e:
@@ -105,7 +130,7 @@ class Product(BaseGSheetModel):
             gsheet: GSheet,
     ) -> float:
         try:
-            sheet_manager = StockManager(self.IDSHEET_MAX2)
+            sheet_manager = self._stock_manager(self.IDSHEET_MAX2)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.SHEET_MAX2}'!{self.CELL_MAX2}")
             return float(cell_value)  # type: ignore
         except Exception as e:
@@ -113,12 +138,12 @@ class Product(BaseGSheetModel):
             return 999999
 
     def get_stock_fake_min_price(self):
-        sheet_manager = StockManager(self.IDSHEET_MIN_STOCKFAKE)
+        sheet_manager = self._stock_manager(self.IDSHEET_MIN_STOCKFAKE)
         cell_value = sheet_manager.get_cell_stock(f"'{self.SHEET_MIN_STOCKFAKE}'!{self.CELL_MIN_STOCKFAKE}")
         return float(cell_value)
 
     def get_stock_fake_max_price(self):
-        sheet_manager = StockManager(self.IDSHEET_MAX_STOCKFAKE)
+        sheet_manager = self._stock_manager(self.IDSHEET_MAX_STOCKFAKE)
         cell_value = sheet_manager.get_cell_stock(f"'{self.SHEET_MAX_STOCKFAKE}'!{self.CELL_MAX_STOCKFAKE}")
         return float(cell_value)
 
@@ -139,11 +164,26 @@ class StockInfo(BaseGSheetModel):
     _stock1: int | None = 0
     _stock2: int | None = 0
 
+    REFERENCE_FIELDS = [
+        ("IDSHEET_STOCK", "SHEET_STOCK", "CELL_STOCK", None),
+        ("IDSHEET_STOCK2", "SHEET_STOCK2", "CELL_STOCK2", None),
+        ("PA_IDSHEET_BLACKLIST", "PA_SHEET_BLACKLIST", "PA_CELL_BLACKLIST", "blacklist"),
+    ]
+
+    def sheet_references(self) -> list[tuple[str, str, str | None]]:
+        references = super().sheet_references()
+        if self.IDSHEET_STOCK and self.IDSHEET_STOCK == self.IDSHEET_STOCK2:
+            # get_stocks reads both cells from SHEET_STOCK in that case
+            references.append((self.IDSHEET_STOCK, f"'{self.SHEET_STOCK}'!{self.CELL_STOCK2}", None))
+        return references
+
     def get_pa_blacklist(self) -> list[str]:
         blacklist = []
         try:
-            sheet_manager = StockManager(self.PA_IDSHEET_BLACKLIST)
-            blacklist = sheet_manager.get_multiple_str_cells(f"'{self.PA_SHEET_BLACKLIST}'!{self.PA_CELL_BLACKLIST}")
+            sheet_manager = self._stock_manager(self.PA_IDSHEET_BLACKLIST)
+            blacklist = sheet_manager.get_multiple_str_cells(
+                f"'{self.PA_SHEET_BLACKLIST}'!{self.PA_CELL_BLACKLIST}", kind="blacklist"
+            )
         except Exception as e:
             print("Cant get pa blacklist: ", e)
             pass
@@ -151,7 +191,7 @@ class StockInfo(BaseGSheetModel):
 
     def stock_1(self) -> int:
         try:
-            stock_mng = StockManager(self.IDSHEET_STOCK)
+            stock_mng = self._stock_manager(self.IDSHEET_STOCK)
             stock1 = stock_mng.get_cell_float_value(f"'{self.SHEET_STOCK}'!{self.CELL_STOCK}")
             self._stock1 = stock1  # type: ignore
             return stock1  # type: ignore
@@ -162,7 +202,7 @@ class StockInfo(BaseGSheetModel):
 
     def stock_2(self) -> int:
         try:
-            stock_mng = StockManager(self.IDSHEET_STOCK2)
+            stock_mng = self._stock_manager(self.IDSHEET_STOCK2)
             stock2 = stock_mng.get_cell_float_value(f"'{self.SHEET_STOCK2}'!{self.CELL_STOCK2}")
             self._stock2 = stock2  # type: ignore
             return stock2  # type: ignore
@@ -173,7 +213,7 @@ class StockInfo(BaseGSheetModel):
 
     def get_stocks(self):
         if self.IDSHEET_STOCK == self.IDSHEET_STOCK2:
-            stock_manager = StockManager(self.IDSHEET_STOCK)
+            stock_manager = self._stock_manager(self.IDSHEET_STOCK)
             cell1 = f"'{self.SHEET_STOCK}'!{self.CELL_STOCK}"
             cell2 = f"'{self.SHEET_STOCK}'!{self.CELL_STOCK2}"
             try:
@@ -182,8 +222,11 @@ class StockInfo(BaseGSheetModel):
                 stock1 = self.stock_1()
                 stock2 = self.stock_2()
         else:
-            stock1 = self.stock_1()
-            stock2 = self.stock_2()
+            # Different spreadsheets, read both at the same time
+            future1 = submit_read(self.stock_1)
+            future2 = submit_read(self.stock_2)
+            stock1 = future1.result()
+            stock2 = future2.result()
         self._stock1 = stock1
         self._stock2 = stock2
         return stock1, stock2
@@ -205,10 +248,12 @@ class G2G(BaseGSheetModel):
     G2G_CELL_PRICESS: Annotated[str | None, "AX"] = ""
     G2G_QUYDOIDONVI: Annotated[float | None, "AY"] = 0
 
+    REFERENCE_FIELDS = [("G2G_IDSHEET_PRICESS", "G2G_SHEET_PRICESS", "G2G_CELL_PRICESS", None)]
+
     def get_g2g_price(
             self
     ) -> float:
-        sheet_manager = StockManager(self.G2G_IDSHEET_PRICESS)
+        sheet_manager = self._stock_manager(self.G2G_IDSHEET_PRICESS)
         blacklist = sheet_manager.get_cell_float_value(f"'{self.G2G_SHEET_PRICESS}'!{self.G2G_CELL_PRICESS}")
         return blacklist
 
@@ -223,8 +268,10 @@ class FUN(BaseGSheetModel):
     FUN_CELL_PRICESS: Annotated[str | None, "BF"] = ""
     FUN_QUYDOIDONVI: Annotated[float | None, "BG"] = None
 
+    REFERENCE_FIELDS = [("FUN_IDSHEET_PRICESS", "FUN_SHEET_PRICESS", "FUN_CELL_PRICESS", None)]
+
     def get_fun_price(self) -> float:
-        sheet_manager = StockManager(self.FUN_IDSHEET_PRICESS)
+        sheet_manager = self._stock_manager(self.FUN_IDSHEET_PRICESS)
         price = sheet_manager.get_cell_float_value(f"'{self.FUN_SHEET_PRICESS}'!{self.FUN_CELL_PRICESS}")
         return price
 
@@ -240,8 +287,10 @@ class BIJ(BaseGSheetModel):
     BIJ_CELL_PRICESS: Annotated[str | None, "BM"] = None
     BIJ_QUYDOIDONVI: Annotated[float | None, "BN"] = None
 
+    REFERENCE_FIELDS = [("BIJ_IDSHEET_PRICESS", "BIJ_SHEET_PRICESS", "BIJ_CELL_PRICESS", None)]
+
     def get_bij_price(self) -> float:
-        sheet_manager = StockManager(self.BIJ_IDSHEET_PRICESS)
+        sheet_manager = self._stock_manager(self.BIJ_IDSHEET_PRICESS)
         price = sheet_manager.get_cell_float_value(f"'{self.BIJ_SHEET_PRICESS}'!{self.BIJ_CELL_PRICESS}")
         return float(price)
 
@@ -256,9 +305,13 @@ class ExtraInfor(BaseGSheetModel):
     GAME_LIST_SHEET: Annotated[str | None, "BU"] = ""
     GAME_LIST_CELLS: Annotated[str | None, "BV"] = ""
 
+    REFERENCE_FIELDS = [("GAME_LIST_SHEET_ID", "GAME_LIST_SHEET", "GAME_LIST_CELLS", "game_list")]
+
     def get_game_list(self) -> list[str]:
-        sheet_manager = StockManager(self.GAME_LIST_SHEET_ID)
-        game_list = sheet_manager.get_multiple_str_cells(f"'{self.GAME_LIST_SHEET}'!{self.GAME_LIST_CELLS}")
+        sheet_manager = self._stock_manager(self.GAME_LIST_SHEET_ID)
+        game_list = sheet_manager.get_multiple_str_cells(
+            f"'{self.GAME_LIST_SHEET}'!{self.GAME_LIST_CELLS}", kind="game_list"
+        )
         return game_list
 
 
@@ -271,7 +324,9 @@ class DD(BaseGSheetModel):
     DD_SHEET_PRICESS: Annotated[str | None, "CH"] = ""
     DD_CELL_PRICESS: Annotated[str | None, "CI"] = ""
 
+    REFERENCE_FIELDS = [("DD_IDSHEET_PRICESS", "DD_SHEET_PRICESS", "DD_CELL_PRICESS", None)]
+
     def get_dd_price(self) -> float:
-        sheet_manager = StockManager(self.DD_IDSHEET_PRICESS)
+        sheet_manager = self._stock_manager(self.DD_IDSHEET_PRICESS)
         price = sheet_manager.get_cell_float_value(f"'{self.DD_SHEET_PRICESS}'!{self.DD_CELL_PRICESS}")
         return float(price)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+from .http_session import DEFAULT_HEADERS, get_conditional_cache, http_timeout
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AsyncCrawler:
+    """
+    Fetches many competitor pages at once on one asyncio loop, at most `per_host`
+    requests per host at a time. Transport errors, 429 and 5xx answers are retried
+    `retries` times with exponential backoff (or Retry-After) without blocking the
+    other fetches. Pages go through the same ETag/Last-Modified cache as fetch_text().
+    """
+
+    def __init__(
+            self,
+            per_host: int = 4,
+            retries: int = 5,
+            backoff: float = 0.5,
+            max_backoff: float = 8,
+    ):
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    async def _get(
+            self,
+            client: httpx.AsyncClient,
+            semaphore: asyncio.Semaphore,
+            name: str,
+            url: str,
+    ) -> str:
+        use_cache = os.getenv("HTTP_CONDITIONAL_CACHE", "1") == "1"
+        entry = get_conditional_cache().load(name, url) if use_cache else None
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            wait = min(self.backoff * 2 ** attempt, self.max_backoff)
+            try:
+                async with semaphore:
+                    response = await client.get(url, headers=headers)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(wait)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                try:
+                    wait = max(wait, float(response.headers.get("Retry-After", 0)))
+                except ValueError:
+                    pass
+                await asyncio.sleep(wait)
+                continue
+            if response.status_code == 304 and entry is not None:
+                return entry["text"]
+            response.raise_for_status()
+            if use_cache:
+                get_conditional_cache().store(name, url, response)
+            return response.text
+
+    async def fetch_all(
+            self,
+            name: str,
+            urls: list[str],
+            cookies: dict | None = None,
+    ) -> list[str | Exception]:
+        semaphores: dict[str, asyncio.Semaphore] = {}
+        async with httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                cookies=cookies,
+                timeout=http_timeout(),
+                follow_redirects=True,
+        ) as client:
+            tasks = []
+            for url in urls:
+                host = urlsplit(url).netloc
+                semaphore = semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+                tasks.append(self._get(client, semaphore, name, url))
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def fetch_texts(
+            self,
+            name: str,
+            urls: list[str],
+            cookies: dict | None = None,
+    ) -> dict[str, str | Exception]:
+        """
+        Blocking facade of fetch_all() for the synchronous pipeline.
+
+        :return: Page text, or the raised exception, of each distinct url.
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return {}
+        return dict(zip(urls, asyncio.run(self.fetch_all(name, urls, cookies))))
+
+
+def get_async_crawler() -> AsyncCrawler:
+    return AsyncCrawler(
+        per_host=int(os.getenv("CRAWLER_PER_HOST", 4)),
+        retries=int(os.getenv("CRAWLER_RETRIES", 5)),
+    )
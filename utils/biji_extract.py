@@ -25,9 +25,30 @@ from webdriver_manager.chrome import ChromeDriverManager
 import constants
 from model.crawl_model import BijOfferItem, extract_integers_from_string
 from model.sheet_model import BIJ
+from utils.host_catalog import HostCatalog
 from utils.selenium_util import SeleniumUtil
 
 
+TABLE_ROWS_SCRIPT = """
+const clean = (text) => text.replace(/^[\\t\\n\\r ]+|[\\t\\n\\r ]+$/g, "").replace(/\\u00a0/g, " ");
+return Array.from(arguments[0].querySelectorAll("tr"), (row) => {
+    const rowData = [];
+    for (const cell of row.querySelectorAll("td")) {
+        const text = clean(cell.innerText);
+        if (text === " ") {
+            continue;
+        } else if (text === "卖给他") {
+            const links = cell.querySelectorAll("a");
+            rowData.push(links.length > 1 ? links[1].href : null);
+        } else {
+            rowData.push(text);
+        }
+    }
+    return rowData;
+});
+"""
+
+
 ## Retry functions
 
 def get_cell_text(cell, retries=3):
@@ -87,12 +108,43 @@ def find_elements_with_retries(parent_element, by, value, retries=3):
 
 
 def get_hostname_by_host_id(data, hostid):
+    if isinstance(data, HostCatalog):
+        return data.hostname(hostid)
     for entry in data:
         if entry['hostid'] == str(hostid):
             return entry['hostname']
     return None
 
 
+def read_table_rows(selenium: SeleniumUtil, table) -> list[list[str]]:
+    """
+    Text of every td of `table`, the buy link for "卖给他" cells, in one WebDriver call.
+    """
+    return selenium.driver.execute_script(TABLE_ROWS_SCRIPT, table)
+
+
+def bij_offer_item_from_row(row: list[str]) -> BijOfferItem:
+    gold = extract_integers_from_string(row[2])
+    if len(gold) == 2:
+        min_gold = gold[0]
+        max_gold = gold[1]
+    else:
+        min_gold = 0
+        max_gold = 0
+    return BijOfferItem(
+        username=str(row[0]),
+        money=float(row[1]),
+        gold=gold,
+        min_gold=min_gold,
+        max_gold=max_gold,
+        dept=row[3],
+        time=row[4],
+        link=row[5],
+        type=row[6],
+        filter=row[7]
+    )
+
+
 def bij_lowest_price(
         BIJ_HOST_DATA: dict,
         selenium: SeleniumUtil,
@@ -123,46 +175,11 @@ def bij_lowest_price(
                     raise
                 time.sleep(0.25)
 
-        data_array = []
-
-        for row in find_elements_with_retries(table, By.TAG_NAME, 'tr', retries=retries_time):
-            row_data = []
-            for cell in get_row_elements_with_retries(row, retries=retries_time):
-                cell_text = get_cell_text(cell, retries=retries_time)
-                if cell_text == " ":
-                    continue
-                elif cell_text == "卖给他":
-                    link_element = find_link_element(cell, retries=retries_time)
-                    row_data.append(get_link_attribute(link_element, attribute='href', retries=retries_time))
-                else:
-                    row_data.append(cell_text)
-            data_array.append(row_data)
-
-        data_array = data_array[3:-2]
-        results = list()
-        for row in data_array:
-            gold = extract_integers_from_string(row[2])
-            if len(gold) == 2:
-                min_gold = gold[0]
-                max_gold = gold[1]
-            else:
-                min_gold = 0
-                max_gold = 0
-            result = BijOfferItem(
-                username=str(row[0]),
-                money=float(row[1]),
-                gold=gold,
-                min_gold=min_gold,
-                max_gold=max_gold,
-                dept=row[3],
-                time=row[4],
-                link=row[5],
-                type=row[6],
-                filter=row[7]
-            )
-            results.append(result)
+        data_array = read_table_rows(selenium, table)[3:-2]
         ans = list()
-        for result in results:
+        # Rows are converted one by one, stopping at the first qualifying offer
+        for row in data_array:
+            result = bij_offer_item_from_row(row)
             if result.type in data.BIJ_DELIVERY_METHOD and result.username not in black_list:
                 if result.min_gold >= data.BIJ_STOCKMIN and result.max_gold <= data.BIJ_STOCKMAX:
                     ans = result
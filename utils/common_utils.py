@@ -3,10 +3,18 @@ import os
 from utils.google_api import StockManager
 
 
-def getCNYRate() -> float:
+def cny_rate_reference() -> tuple[str, str]:
+    return (
+        os.getenv("CNY_RATE_SPREADSHEET_ID"),
+        f"'{os.getenv('CNY_RATE_SHEET_NAME')}'!{os.getenv('CNY_RATE_CELL')}",
+    )
+
+
+def getCNYRate(resolver=None) -> float:
     try:
-        sheet_manager = StockManager(os.getenv("CNY_RATE_SPREADSHEET_ID"))
-        cell_value = sheet_manager.get_cell_float_value(f"'{os.getenv('CNY_RATE_SHEET_NAME')}'!{os.getenv('CNY_RATE_CELL')}")
+        spreadsheet_id, range_name = cny_rate_reference()
+        sheet_manager = StockManager(spreadsheet_id, resolver=resolver)
+        cell_value = sheet_manager.get_cell_float_value(range_name, kind="cny_rate")
         # _rate_sheet = os.getenv("CNY_RATE_SPREADSHEET_ID")
         # _rate_worksheet = os.getenv("CNY_RATE_SHEET_NAME")
         # _cell = os.getenv("CNY_RATE_CELL")
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+R = TypeVar("R")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Key of a listing url: lower-case scheme and host, no default port, fragment or
+    trailing slash, and sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class FetchCache:
+    """
+    Results of url fetches shared by the rows of a cycle. A url requested while its
+    fetch is running waits for that fetch instead of starting another one. Results
+    older than `max_age` seconds are fetched again, failed fetches are never kept.
+    With `keep_across_cycles` the results survive new_cycle() until they expire.
+    """
+
+    def __init__(self, max_age: float = 300, keep_across_cycles: bool = False):
+        self.max_age = max_age
+        self.keep_across_cycles = keep_across_cycles
+        self._entries: dict[str, tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.joins = 0
+        self.misses = 0
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        return time.monotonic() - fetched_at < self.max_age
+
+    def get(self, url: str) -> Any | None:
+        """
+        Finished, fresh result of `url`, None otherwise.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry[0].done() or not self._is_fresh(entry[1]):
+                return None
+            self.hits += 1
+        return entry[0].result()
+
+    def get_or_fetch(self, url: str, fetch: Callable[[], R]) -> R:
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not entry[0].done() or self._is_fresh(entry[1])):
+                if entry[0].done():
+                    self.hits += 1
+                else:
+                    self.joins += 1
+                future = entry[0]
+                is_owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._entries[key] = (future, time.monotonic())
+                is_owner = True
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            with self._lock:
+                if self._entries.get(key, (None,))[0] is future:
+                    del self._entries[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # Age counts from the end of the fetch
+            if self._entries.get(key, (None,))[0] is future:
+                self._entries[key] = (future, time.monotonic())
+        future.set_result(result)
+        return result
+
+    def new_cycle(self) -> None:
+        with self._lock:
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if not entry[0].done() or (self.keep_across_cycles and self._is_fresh(entry[1]))
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "joins": self.joins,
+                "misses": self.misses,
+            }
+
+
+_pa_fetch_cache: FetchCache | None = None
+_pa_fetch_cache_lock = threading.Lock()
+
+
+def get_pa_fetch_cache() -> FetchCache:
+    # Created lazily so the PA_FETCH_* settings are read after settings.env is loaded
+    global _pa_fetch_cache
+    with _pa_fetch_cache_lock:
+        if _pa_fetch_cache is None:
+            _pa_fetch_cache = FetchCache(
+                max_age=float(os.getenv("PA_FETCH_MAX_AGE", 300)),
+                keep_across_cycles=os.getenv("PA_FETCH_CACHE_ACROSS_CYCLES", "0") == "1",
+            )
+        return _pa_fetch_cache
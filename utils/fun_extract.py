@@ -1,21 +1,22 @@
-import requests
 from requests.exceptions import HTTPError
 
 from bs4 import BeautifulSoup, Tag
 
 from decorator.retry import retry
 from .exceptions import FUNCrawlerError
+from .http_session import fetch_text
 
 from model.crawl_model import FUNOfferItem
 
+FUN_COOKIES = {"cy": "usd"}
+
 
 @retry(retries=3, delay=1.2, exception=HTTPError)
 def __get_soup(
     url: str,
 ) -> BeautifulSoup:
-    res = requests.get(url=url, cookies={"cy": "usd"})
-    res.raise_for_status()
-    return BeautifulSoup(res.text, "html.parser")
+    res = fetch_text("funpay", url, cookies=FUN_COOKIES)
+    return BeautifulSoup(res, "html.parser")
 
 
 def __extract_filters_data(
@@ -107,12 +108,10 @@ def __extract_fun_offer_items_from_soup(
     return fun_offer_items
 
 
-@retry(10, 0.25, HTTPError)
-def fun_extract_offer_items(
-    url: str,
+def __extract_fun_offer_items_with_filters(
+    soup: BeautifulSoup,
     filters: list[str],
 ) -> list[FUNOfferItem]:
-    soup = __get_soup(url)
     filters_data = __extract_filters_data(soup, filters)
     filter_data_txt = ""
     for filter in filters_data:
@@ -121,3 +120,12 @@ def fun_extract_offer_items(
     offer_item_tags = soup.select(f".tc-item{filter_data_txt}")
     fun_offer_items = __extract_fun_offer_items_from_soup(offer_item_tags)
     return fun_offer_items
+
+
+@retry(10, 0.25, HTTPError)
+def fun_extract_offer_items(
+    url: str,
+    filters: list[str],
+) -> list[FUNOfferItem]:
+    soup = __get_soup(url)
+    return __extract_fun_offer_items_with_filters(soup, filters)
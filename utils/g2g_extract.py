@@ -1,27 +1,25 @@
 from typing import Final
-import requests
 from decorator.retry import retry
 from requests import HTTPError
 from bs4 import BeautifulSoup, Tag
 
 from model.crawl_model import DeliveryTime, TimeUnit, G2GOfferItem
 from .exceptions import G2GCrawlerError
+from .http_session import fetch_text
 
 import re
 
+G2G_COOKIES: Final[dict[str, str]] = {
+    "g2g_regional": '{"country": "VN", "currency": "USD", "language": "en"}'
+}
+
 
 @retry(retries=5, delay=1.2, exception=HTTPError)
 def __get_soup(
         url: str,
 ) -> BeautifulSoup:
-    res = requests.get(
-        url=url,
-        cookies={
-            "g2g_regional": '{"country": "VN", "currency": "USD", "language": "en"}'
-        },
-    )
-    res.raise_for_status()
-    return BeautifulSoup(res.text, "html.parser")
+    res = fetch_text("g2g", url, cookies=G2G_COOKIES)
+    return BeautifulSoup(res, "html.parser")
 
 
 def __g2g_extract_offer_items_from_soup(
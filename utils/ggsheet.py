@@ -1,8 +1,22 @@
 import gspread.urls
 import gspread.utils
+from gspread.http_client import HTTPClient
 from oauth2client.service_account import ServiceAccountCredentials
 import gspread
 
+from utils.rate_limiter import get_sheets_limiter
+
+
+class RateLimitedHTTPClient(HTTPClient):
+    """
+    gspread HTTP client that sends every request through the shared Sheets limiter,
+    GET requests against the read budget and everything else against the write budget.
+    """
+
+    def request(self, method: str, endpoint: str, *args, **kwargs):
+        kind = "read" if method.upper() == "GET" else "write"
+        return get_sheets_limiter().call(kind, super().request, method, endpoint, *args, **kwargs)
+
 
 class GSheet:
     client: gspread.client.Client
@@ -16,7 +30,7 @@ class GSheet:
             "https://www.googleapis.com/auth/drive",
         ]
         creds = ServiceAccountCredentials.from_json_keyfile_name(keypath, scope)  # type: ignore
-        client = gspread.auth.authorize(creds)  # type: ignore
+        client = gspread.auth.authorize(creds, http_client=RateLimitedHTTPClient)  # type: ignore
         return client
 
     def get_sheet(
@@ -1,34 +1,106 @@
-import time
-
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
 
 from decorator.time_execution import time_execution
+from utils.rate_limiter import get_sheets_limiter
+from utils.sheet_backend import get_sheet_backend
+from utils.ttl_cache import get_reference_cache, reference_ttl
+
+R = TypeVar("R")
+
+_local = threading.local()
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_sheets_service(credentials_file: str = "key.json"):
+    # Service objects are not thread-safe (httplib2), so each thread builds its own once
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    if credentials_file not in services:
+        services[credentials_file] = get_sheet_backend().sheets_service(credentials_file)
+    return services[credentials_file]
+
+
+def get_fetch_executor() -> ThreadPoolExecutor:
+    # Bounded pool shared by every concurrent spreadsheet read, sized by SHEETS_FETCH_WORKERS
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SHEETS_FETCH_WORKERS", 4)),
+                thread_name_prefix="sheets-fetch",
+            )
+        return _executor
+
+
+def submit_read(func: Callable[..., R], *args: Any, **kwargs: Any) -> Future:
+    """
+    Run a blocking spreadsheet read on the shared pool and return its future.
+    Every pool thread builds its own service, and the rate limiter is shared.
+    """
+    return get_fetch_executor().submit(func, *args, **kwargs)
+
+
+def fetch_ranges_async(spreadsheet_id: str, ranges: list[str]) -> Future:
+    """
+    Read `ranges` of one spreadsheet with a single batchGet on the shared pool.
+
+    :return: Future of the values of each range, in the same order.
+    """
+    return submit_read(lambda: StockManager(spreadsheet_id).get_ranges(ranges))
 
 
 class StockManager:
-    def __init__(self, spreadsheet_id: str):
+    def __init__(self, spreadsheet_id: str, resolver=None):
         self.credentials_file = "key.json"
         self.spreadsheet_id = spreadsheet_id
-        time.sleep(1)
+        self.resolver = resolver
         self.service = self._initialize_service()
 
     def _initialize_service(self):
-        credentials = Credentials.from_service_account_file(
-            self.credentials_file,
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
+        return get_sheets_service(self.credentials_file)
+
+    def _get_values(self, range_name: str, kind: str | None = None) -> list[list[str]]:
+        if self.resolver is not None:
+            values = self.resolver.lookup(self.spreadsheet_id, range_name)
+            if values is not None:
+                return values
+        ttl = reference_ttl(kind)
+        if ttl > 0:
+            values = get_reference_cache().get((self.spreadsheet_id, range_name))
+            if values is not None:
+                return values
+        request = (
+            self.service.spreadsheets()
+            .values()
+            .get(spreadsheetId=self.spreadsheet_id, range=range_name)
+        )
+        result = get_sheets_limiter().call("read", request.execute)
+        values = result.get('values', [])
+        get_reference_cache().set((self.spreadsheet_id, range_name), values, ttl)
+        return values
+
+    def get_ranges(self, ranges: list[str]) -> list[list[list[str]]]:
+        """
+        Read several ranges of this spreadsheet with a single batchGet request.
+
+        :param ranges: A1 ranges, the result keeps the same order.
+        """
+        request = (
+            self.service.spreadsheets()
+            .values()
+            .batchGet(spreadsheetId=self.spreadsheet_id, ranges=ranges)
         )
-        return build('sheets', 'v4', credentials=credentials)
+        result = get_sheets_limiter().call("read", request.execute)
+        return [value_range.get("values", []) for value_range in result.get("valueRanges", [])]
 
-    def get_cell_float_value(self, range_name: str) -> float:
+    def get_cell_float_value(self, range_name: str, kind: str | None = None) -> float:
         try:
-            result = (
-                self.service.spreadsheets()
-                .values()
-                .get(spreadsheetId=self.spreadsheet_id, range=range_name)
-                .execute()
-            )
-            cell_value = result.get('values', [[]])[0][0]
+            cell_value = (self._get_values(range_name, kind) or [[]])[0][0]
             # Convert to integer after handling float-like values
             stock_value = float(cell_value)
             return stock_value
@@ -41,13 +113,7 @@ class StockManager:
 
     def get_cell_stock(self, range_name: str) -> float:
         try:
-            result = (
-                self.service.spreadsheets()
-                .values()
-                .get(spreadsheetId=self.spreadsheet_id, range=range_name)
-                .execute()
-            )
-            cell_value = result.get('values', [[]])[0][0]
+            cell_value = (self._get_values(range_name) or [[]])[0][0]
             # Convert to integer after handling float-like values
             stock_value = float(cell_value)
             return stock_value
@@ -57,18 +123,18 @@ class StockManager:
 
     def get_multiple_cells(self, ranges: list[str]) -> list[int]:
         try:
-            # Make a batch request for multiple ranges
-            result = (
-                self.service.spreadsheets()
-                .values()
-                .batchGet(spreadsheetId=self.spreadsheet_id, ranges=ranges)
-                .execute()
-            )
-            values = result.get("valueRanges", [])
+            values = None
+            if self.resolver is not None:
+                values = [self.resolver.lookup(self.spreadsheet_id, range_name) for range_name in ranges]
+                if any(value is None for value in values):
+                    values = None
+            if values is None:
+                # Make a batch request for multiple ranges
+                values = self.get_ranges(ranges)
             # Extract values from the response, convert to integers if possible
             cell_values = []
             for value_range in values:
-                cell = value_range.get("values", [[]])[0][0]
+                cell = (value_range or [[]])[0][0]
                 cell_values.append(int(float(cell)))  # Handle float-like strings like '0.'
             return cell_values
         except ValueError as ve:
@@ -76,16 +142,9 @@ class StockManager:
         except Exception as e:
             raise Exception(f"Error getting values from ranges {ranges}{e}")
 
-    def get_multiple_str_cells(self, range_str: str) -> list[str]:
+    def get_multiple_str_cells(self, range_str: str, kind: str | None = None) -> list[str]:
         try:
-            # Make a request for the single range
-            result = (
-                self.service.spreadsheets()
-                .values()
-                .get(spreadsheetId=self.spreadsheet_id, range=range_str)
-                .execute()
-            )
-            values = result.get("values", [])
+            values = self._get_values(range_str, kind)
             # Extract values from the response as strings
             cell_values = [str(cell[0]) for cell in values if cell]
             return cell_values
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Iterator
+
+import constants
+
+
+class HostCatalog:
+    """
+    bijiaqi hosts of DATA_PATH indexed by hostid and gameid. The JSON is converted
+    once into a SQLite file, rebuilt when the checksum of the JSON changes, and the
+    index is only loaded on the first lookup.
+    """
+
+    def __init__(
+            self,
+            json_path: str = constants.DATA_PATH,
+            db_path: str = constants.HOST_CATALOG_PATH,
+    ):
+        self.json_path = json_path
+        self.db_path = db_path
+        self._hosts: dict[str, dict] | None = None
+        self._hosts_by_game: dict[str, list[dict]] = {}
+        self._lock = threading.Lock()
+
+    def _checksum(self) -> str:
+        with open(self.json_path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def _rebuild(self, conn: sqlite3.Connection, checksum: str) -> None:
+        print(f"Rebuilding host catalog from {self.json_path}")
+        with open(self.json_path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS hosts")
+            conn.execute(
+                "CREATE TABLE hosts (hostid TEXT PRIMARY KEY, gameid TEXT, hostname TEXT, language TEXT)"
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO hosts VALUES (?, ?, ?, ?)",
+                [
+                    (entry["hostid"], entry.get("gameid"), entry.get("hostname"), entry.get("language"))
+                    for entry in entries
+                ],
+            )
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('checksum', ?)", (checksum,))
+
+    def _load(self) -> None:
+        checksum = self._checksum()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            stored = conn.execute("SELECT value FROM meta WHERE key = 'checksum'").fetchone()
+            if stored is None or stored[0] != checksum:
+                self._rebuild(conn, checksum)
+            rows = conn.execute("SELECT hostid, gameid, hostname, language FROM hosts").fetchall()
+        finally:
+            conn.close()
+        hosts: dict[str, dict] = {}
+        hosts_by_game: dict[str, list[dict]] = {}
+        for hostid, gameid, hostname, language in rows:
+            entry = {"gameid": gameid, "hostid": hostid, "hostname": hostname, "language": language}
+            hosts[hostid] = entry
+            hosts_by_game.setdefault(gameid, []).append(entry)
+        self._hosts, self._hosts_by_game = hosts, hosts_by_game
+
+    def _index(self) -> dict[str, dict]:
+        with self._lock:
+            if self._hosts is None:
+                self._load()
+            return self._hosts
+
+    def get(self, host_id) -> dict | None:
+        return self._index().get(str(host_id))
+
+    def hostname(self, host_id) -> str | None:
+        entry = self.get(host_id)
+        return entry["hostname"] if entry else None
+
+    def hosts_of_game(self, game_id) -> list[dict]:
+        self._index()
+        return self._hosts_by_game.get(str(game_id), [])
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._index().values())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+
+_host_catalog: HostCatalog | None = None
+_host_catalog_lock = threading.Lock()
+
+
+def get_host_catalog() -> HostCatalog:
+    global _host_catalog
+    with _host_catalog_lock:
+        if _host_catalog is None:
+            _host_catalog = HostCatalog()
+        return _host_catalog
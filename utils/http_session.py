@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401, lets urllib3 decode "br" responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def new_session(pool_size: int = 10) -> requests.Session:
+    """
+    Session with keep-alive connection pools of `pool_size` per host and compressed responses.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def http_timeout() -> float:
+    return float(os.getenv("HTTP_TIMEOUT", 20))
+
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(name: str = "default") -> requests.Session:
+    # One session per site, shared by every thread so connections are reused
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = new_session(int(os.getenv("HTTP_POOL_SIZE", 10)))
+        return _sessions[name]
+
+
+class ConditionalCache:
+    """
+    On-disk copy of the last 200 answer of each url with its ETag and Last-Modified,
+    sent back as If-None-Match / If-Modified-Since so an unchanged page costs a 304.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.revalidated = 0
+        self.downloaded = 0
+
+    def _path(self, name: str, url: str) -> pathlib.Path:
+        return self.directory.joinpath(hashlib.sha1(f"{name} {url}".encode()).hexdigest() + ".json")
+
+    def load(self, name: str, url: str) -> dict | None:
+        try:
+            return json.loads(self._path(name, url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def store(self, name: str, url: str, response: requests.Response) -> None:
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "text": response.text,
+        }
+        if not entry["etag"] and not entry["last_modified"]:
+            return
+        path = self._path(name, url)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def get(self, name: str, url: str, **kwargs) -> str:
+        """
+        Text of `url` fetched with the `name` session, revalidated against the cached copy.
+        Raises requests.HTTPError on error answers like response.raise_for_status().
+        """
+        entry = self.load(name, url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = get_http_session(name).get(
+            url,
+            headers=headers,
+            timeout=kwargs.pop("timeout", http_timeout()),
+            **kwargs,
+        )
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            return entry["text"]
+        response.raise_for_status()
+        with self._lock:
+            self.downloaded += 1
+        self.store(name, url, response)
+        return response.text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"not_modified": self.revalidated, "downloaded": self.downloaded}
+
+
+_conditional_cache: ConditionalCache | None = None
+_conditional_cache_lock = threading.Lock()
+
+
+def get_conditional_cache() -> ConditionalCache:
+    global _conditional_cache
+    with _conditional_cache_lock:
+        if _conditional_cache is None:
+            _conditional_cache = ConditionalCache(os.getenv("HTTP_CACHE_DIR", "storage/http_cache"))
+        return _conditional_cache
+
+
+def fetch_text(name: str, url: str, **kwargs) -> str:
+    """
+    GET `url` with the shared `name` session, through the conditional cache unless
+    HTTP_CONDITIONAL_CACHE=0.
+    """
+    if os.getenv("HTTP_CONDITIONAL_CACHE", "1") == "1":
+        return get_conditional_cache().get(name, url, **kwargs)
+    response = get_http_session(name).get(url, timeout=kwargs.pop("timeout", http_timeout()), **kwargs)
+    response.raise_for_status()
+    return response.text
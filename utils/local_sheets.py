@@ -0,0 +1,344 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Any
+
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+from gspread.worksheet import ValueRange
+
+from utils.rate_limiter import get_sheets_limiter
+
+
+class LocalQuotaError(Exception):
+    """
+    Injected stand-in for a 429 answer of the Sheets API.
+    """
+    status = 429
+
+    def __init__(self, retry_after: float = 0):
+        super().__init__("Local sheet quota exceeded")
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+def split_range_name(range_name: str) -> tuple[str | None, str]:
+    if "!" not in range_name:
+        return None, range_name
+    sheet_name, a1 = range_name.rsplit("!", 1)
+    if sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    return sheet_name, a1
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(values: list[list[str]]) -> list[list[str]]:
+    # Like the API, drop trailing empty cells of each row and trailing empty rows
+    trimmed = []
+    for row in values:
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+class LocalWorkbookStore:
+    """
+    Spreadsheets kept in memory and loaded from `<directory>/<spreadsheet id>.json`
+    ({"Sheet name": [[row values], ...]}) or `<directory>/<spreadsheet id>.xlsx`.
+    Every request sleeps `latency` seconds and fails with LocalQuotaError with
+    probability `quota_error_rate`, to benchmark the cycle against a slow or
+    throttled API.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            latency: float = 0,
+            quota_error_rate: float = 0,
+            persist: bool = False,
+    ):
+        self.directory = directory
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.persist = persist
+        self.request_count = 0
+        self._books: dict[str, dict[str, list[list[str]]]] = {}
+        self._lock = threading.RLock()
+
+    def simulate_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.quota_error_rate > 0 and random.random() < self.quota_error_rate:
+            raise LocalQuotaError()
+
+    def book(self, spreadsheet_id: str) -> dict[str, list[list[str]]]:
+        with self._lock:
+            if spreadsheet_id not in self._books:
+                self._books[spreadsheet_id] = self._load(spreadsheet_id)
+            return self._books[spreadsheet_id]
+
+    def _load(self, spreadsheet_id: str) -> dict[str, list[list[str]]]:
+        json_path = os.path.join(self.directory, f"{spreadsheet_id}.json")
+        if os.path.exists(json_path):
+            with open(json_path, encoding="utf-8") as file:
+                return {
+                    name: [[_cell_text(value) for value in row] for row in rows]
+                    for name, rows in json.load(file).items()
+                }
+        xlsx_path = os.path.join(self.directory, f"{spreadsheet_id}.xlsx")
+        if os.path.exists(xlsx_path):
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+            return {
+                worksheet.title: [[_cell_text(value) for value in row] for row in worksheet.iter_rows(values_only=True)]
+                for worksheet in workbook.worksheets
+            }
+        raise FileNotFoundError(f"No local spreadsheet {spreadsheet_id} in {self.directory}")
+
+    def save(self, spreadsheet_id: str) -> None:
+        with self._lock:
+            with open(os.path.join(self.directory, f"{spreadsheet_id}.json"), "w", encoding="utf-8") as file:
+                json.dump(self.book(spreadsheet_id), file, ensure_ascii=False)
+
+    def sheet(self, spreadsheet_id: str, sheet_name: str | None) -> list[list[str]]:
+        book = self.book(spreadsheet_id)
+        if sheet_name is None:
+            return next(iter(book.values()))
+        if sheet_name not in book:
+            raise ValueError(f"Unable to parse range: sheet {sheet_name} not found in {spreadsheet_id}")
+        return book[sheet_name]
+
+    def read(self, spreadsheet_id: str, range_name: str, sheet_name: str | None = None) -> list[list[str]]:
+        range_sheet_name, a1 = split_range_name(range_name)
+        rows = self.sheet(spreadsheet_id, range_sheet_name or sheet_name)
+        grid = a1_range_to_grid_range(a1)
+        with self._lock:
+            selected = rows[grid.get("startRowIndex", 0):grid.get("endRowIndex", len(rows))]
+            return _trim([
+                row[grid.get("startColumnIndex", 0):grid.get("endColumnIndex", len(row))]
+                for row in selected
+            ])
+
+    def write(self, spreadsheet_id: str, range_name: str, values: list[list[Any]], sheet_name: str | None = None):
+        range_sheet_name, a1 = split_range_name(range_name)
+        rows = self.sheet(spreadsheet_id, range_sheet_name or sheet_name)
+        grid = a1_range_to_grid_range(a1)
+        with self._lock:
+            for i, row_values in enumerate(values):
+                row_index = grid.get("startRowIndex", 0) + i
+                while len(rows) <= row_index:
+                    rows.append([])
+                row = rows[row_index]
+                for j, value in enumerate(row_values):
+                    col_index = grid.get("startColumnIndex", 0) + j
+                    while len(row) <= col_index:
+                        row.append("")
+                    row[col_index] = _cell_text(value)
+            if self.persist:
+                self.save(spreadsheet_id)
+
+
+class _LocalRequest:
+    def __init__(self, store: LocalWorkbookStore, func):
+        self._store = store
+        self._func = func
+
+    def execute(self) -> dict:
+        self._store.simulate_request()
+        return self._func()
+
+
+class LocalSheetsService:
+    """
+    The part of the googleapiclient Sheets service used by StockManager:
+    spreadsheets().values().get(...) and .batchGet(...).
+    """
+
+    def __init__(self, store: LocalWorkbookStore):
+        self.store = store
+
+    def spreadsheets(self) -> "LocalSheetsService":
+        return self
+
+    def values(self) -> "LocalSheetsService":
+        return self
+
+    def get(self, spreadsheetId: str, range: str) -> _LocalRequest:
+        return _LocalRequest(
+            self.store,
+            lambda: {"range": range, "values": self.store.read(spreadsheetId, range)},
+        )
+
+    def batchGet(self, spreadsheetId: str, ranges: list[str]) -> _LocalRequest:
+        return _LocalRequest(
+            self.store,
+            lambda: {
+                "valueRanges": [
+                    {"range": range_name, "values": self.store.read(spreadsheetId, range_name)}
+                    for range_name in ranges
+                ]
+            },
+        )
+
+
+class LocalWorksheet:
+    """
+    The part of gspread.worksheet.Worksheet used by the tool. Requests go through
+    the shared Sheets limiter like the gspread client does.
+    """
+
+    def __init__(self, store: LocalWorkbookStore, spreadsheet_id: str, title: str):
+        self.store = store
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+
+    def _call(self, kind: str, func, *args):
+        def request():
+            self.store.simulate_request()
+            return func(*args)
+
+        return get_sheets_limiter().call(kind, request)
+
+    def _value_range(self, range_name: str) -> ValueRange:
+        return ValueRange.from_json({
+            "range": range_name,
+            "majorDimension": "ROWS",
+            "values": self.store.read(self.spreadsheet_id, range_name, self.title),
+        })
+
+    def get(self, range_name: str, **kwargs) -> ValueRange:
+        return self._call("read", self._value_range, range_name)
+
+    def batch_get(self, ranges: list[str], **kwargs) -> list[ValueRange]:
+        return self._call("read", lambda: [self._value_range(range_name) for range_name in ranges])
+
+    def col_values(self, col: int, **kwargs) -> list[str]:
+        def read_column():
+            column = rowcol_to_a1(1, col).rstrip("1")
+            return [row[0] if row else "" for row in self.store.read(self.spreadsheet_id, f"{column}:{column}", self.title)]
+
+        return self._call("read", read_column)
+
+    def update_cell(self, row: int, col: int, value: Any) -> None:
+        self._call("write", self.store.write, self.spreadsheet_id, rowcol_to_a1(row, col), [[value]], self.title)
+
+    def update(self, range_name: str, values: Any, **kwargs) -> None:
+        if not isinstance(values, list):
+            values = [[values]]
+        self._call("write", self.store.write, self.spreadsheet_id, range_name, values, self.title)
+
+    def batch_update(self, data: list[dict], **kwargs) -> None:
+        def write_all():
+            for item in data:
+                self.store.write(self.spreadsheet_id, item["range"], item["values"], self.title)
+
+        self._call("write", write_all)
+
+
+class LocalSpreadsheet:
+    def __init__(self, store: LocalWorkbookStore, spreadsheet_id: str):
+        self.store = store
+        self.id = spreadsheet_id
+
+    def worksheet(self, title: str) -> LocalWorksheet:
+        self.store.sheet(self.id, title)
+        return LocalWorksheet(self.store, self.id, title)
+
+    @property
+    def sheet1(self) -> LocalWorksheet:
+        return LocalWorksheet(self.store, self.id, next(iter(self.store.book(self.id))))
+
+
+class LocalGSheet:
+    """
+    Drop-in for utils.ggsheet.GSheet reading local files, works with Sheet.from_sheet_id.
+    """
+
+    def __init__(self, store: LocalWorkbookStore):
+        self.store = store
+
+    def get_sheet(self, sheet_id: str) -> LocalSpreadsheet:
+        self.store.book(sheet_id)
+        return LocalSpreadsheet(self.store, sheet_id)
+
+    def read_sheet_data(self, sheet_id):
+        return self.get_sheet(sheet_id).sheet1.get("A:ZZ")
+
+    def load_cell_value(self, spreadsheet_id: str, sheet_name: str, cell: str) -> float:
+        return float(self.store.read(spreadsheet_id, cell, sheet_name)[0][0])
+
+
+def write_synthetic_workbook(
+        directory: str,
+        spreadsheet_id: str,
+        sheet_name: str,
+        row_count: int,
+        reference_spreadsheet_id: str = "local_reference",
+) -> None:
+    """
+    Write a main sheet with `row_count` active config rows (from row 2) and the
+    spreadsheet their min/max/stock/blacklist references point at.
+    """
+    from model.sheet_model import Product, StockInfo, ExtraInfor
+
+    sample = {
+        "CHECK": "1", "Product_name": "Synthetic", "Product_link": "L0",
+        "PRODUCT_COMPARE": "https://www.playerauctions.com/wow-classic-gold/",
+        "DONGIAGIAM_MIN": "0.001", "DONGIAGIAM_MAX": "0.002", "DONGIA_LAMTRON": "3", "EXCLUDE_ADS": "1",
+        "DELIVERY_TIME": "1 Hours", "FEEDBACK": "0", "MIN_UNIT": "1", "MINSTOCK": "1",
+        "IDSHEET_MIN": reference_spreadsheet_id, "SHEET_MIN": "Price", "CELL_MIN": "A{n}",
+        "IDSHEET_MAX": reference_spreadsheet_id, "SHEET_MAX": "Price", "CELL_MAX": "B{n}",
+        "DELIVERY0": "0", "DELIVERY1": "1",
+        "IDSHEET_STOCK": reference_spreadsheet_id, "SHEET_STOCK": "Stock", "CELL_STOCK": "A{n}",
+        "STOCK_LIMIT": "100", "STOCK_FAKE": "1000",
+        "PA_IDSHEET_BLACKLIST": reference_spreadsheet_id, "PA_SHEET_BLACKLIST": "Blacklist",
+        "PA_CELL_BLACKLIST": "A1:A20",
+        "MIN_UNIT_PER_ORDER": "1", "DELIVERY_GUARANTEE": "1", "CURRENCY_PER_UNIT": "1",
+    }
+    columns = {}
+    for model in [Product, StockInfo, ExtraInfor]:
+        for field_name, proper in model.fields_exclude_row_index().items():
+            columns[field_name] = a1_range_to_grid_range(f"{proper.metadata[0]}1")["startColumnIndex"]
+    width = max(columns.values()) + 1
+    header = [""] * width
+    for field_name, col_index in columns.items():
+        header[col_index] = field_name
+    main_rows = [header]
+    price_rows, stock_rows = [], []
+    for n in range(2, row_count + 2):
+        row = [""] * width
+        for field_name, value in sample.items():
+            row[columns[field_name]] = value.format(n=n)
+        main_rows.append(row)
+        price_rows.append([f"{0.01 + n * 0.0001:.4f}", f"{0.05 + n * 0.0001:.4f}"])
+        stock_rows.append([str(50 + n % 200)])
+    price_rows.insert(0, ["min", "max"])
+    stock_rows.insert(0, ["stock"])
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{spreadsheet_id}.json"), "w", encoding="utf-8") as file:
+        json.dump({sheet_name: main_rows}, file)
+    with open(os.path.join(directory, f"{reference_spreadsheet_id}.json"), "w", encoding="utf-8") as file:
+        json.dump({
+            "Price": price_rows,
+            "Stock": stock_rows,
+            "Blacklist": [[f"seller{i}"] for i in range(20)],
+            "CNY": [["7.2"]],
+        }, file)
+
+
+if __name__ == "__main__":
+    write_synthetic_workbook("storage/local_sheets", "local_main", "Sheet1", 1000)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import gspread
+from gspread.utils import ValueInputOption
+
+LOG_COLUMNS = {
+    "log": "D",
+    "time": "E",
+    "error": "CK",
+}
+
+
+class LogCellBuffer:
+    """
+    Collects the log (D), time (E) and error (CK) cell writes of a cycle and sends
+    them with one worksheet.batch_update, every `flush_rows` rows, every
+    `flush_seconds` seconds, or when flush() is called. Use it as a context
+    manager (or call flush() in a finally block) so pending writes survive a crash.
+    """
+
+    def __init__(
+            self,
+            worksheet: gspread.worksheet.Worksheet,
+            flush_rows: int = 20,
+            flush_seconds: float = 60,
+    ):
+        self.worksheet = worksheet
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.write_count = 0
+        self.request_count = 0
+        self._pending: dict[str, str] = {}
+        self._pending_rows: set[int] = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, row_index: int, value: str, log_type: str = "log") -> None:
+        with self._lock:
+            self._pending[f"{LOG_COLUMNS[log_type]}{row_index}"] = value
+            self._pending_rows.add(row_index)
+            self.write_count += 1
+            is_due = (
+                    0 < self.flush_rows <= len(self._pending_rows)
+                    or time.monotonic() - self._last_flush >= self.flush_seconds
+            )
+        if is_due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_rows = set()
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            self.request_count += 1
+        data = [{"range": cell, "values": [[value]]} for cell, value in pending.items()]
+        try:
+            self.worksheet.batch_update(data, value_input_option=ValueInputOption.user_entered)
+        except Exception as e:
+            print(f"Error writing to log cells: {e}")
+
+    @property
+    def saved_requests(self) -> int:
+        return self.write_count - self.request_count
+
+    def __enter__(self) -> "LogCellBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.flush()
@@ -1,18 +1,154 @@
+import hashlib
+import json
+import os
+import pathlib
+import re
+import threading
+from typing import Callable, Iterable
+
 import execjs
+import requests
 from bs4 import BeautifulSoup, Tag
 from requests import HTTPError
 
+import constants
 from decorator.retry import retry
 from model.crawl_model import Seller, DeliveryTime, TimeUnit, OfferItem
 from .exceptions import PACrawlerError
-from .selenium_util import SeleniumUtil
+from .fetch_cache import get_pa_fetch_cache
+from .http_session import get_http_session, http_timeout
+from .selenium_util import SeleniumUtil, SeleniumPool
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # optional, offers are parsed with BeautifulSoup without it
+    etree = None
+    lxml_html = None
+
+try:
+    import json5
+except ImportError:  # optional, non-JSON offersModel literals then go through execjs
+    json5 = None
+
+OFFERS_MODEL_PATTERN = re.compile(r"\bvar\s+offersModel\s*=\s*")
+JSON_DECODER = json.JSONDecoder()
+
+CHALLENGE_MARKERS = ("<title>Just a moment", "cf-chl-", "g-recaptcha", "Access denied")
+PA_HOME_URL = "https://www.playerauctions.com/"
+
+_fetch_stats = {"http": 0, "browser": 0}
+_fetch_stats_lock = threading.Lock()
+
+
+def pa_fetch_stats() -> dict:
+    with _fetch_stats_lock:
+        return dict(_fetch_stats)
+
+
+def __count_fetch(kind: str) -> None:
+    with _fetch_stats_lock:
+        _fetch_stats[kind] += 1
+
+
+def __is_challenge_page(response: requests.Response) -> bool:
+    # 403/429/503 are the usual block answers, any other error is retried in the browser too
+    if response.status_code != 200:
+        return True
+    # A listing page without the offersModel script can't be parsed anyway
+    if "offersModel" not in response.text:
+        return True
+    return any(marker in response.text for marker in CHALLENGE_MARKERS)
+
+
+def __fetch_html(url: str) -> str | None:
+    try:
+        response = get_http_session("playerauctions").get(url, timeout=http_timeout())
+    except requests.RequestException as e:
+        print(f"HTTP fetch of {url} failed, using browser: {e}")
+        return None
+    if __is_challenge_page(response):
+        print(f"HTTP fetch of {url} got a challenge page ({response.status_code}), using browser")
+        return None
+    return response.text
+
+
+def __sync_browser_session(browser: SeleniumUtil) -> None:
+    """
+    Copy the cookies and user agent of `browser`, which just passed any challenge,
+    to the HTTP session so the next fetches are accepted without a browser.
+    """
+    session = get_http_session("playerauctions")
+    for cookie in browser.driver.get_cookies():
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path", "/"),
+        )
+    user_agent = browser.driver.execute_script("return navigator.userAgent")
+    if user_agent:
+        session.headers["User-Agent"] = user_agent.replace("HeadlessChrome", "Chrome")
+
+
+def seed_pa_session(browser: SeleniumUtil) -> None:
+    """
+    Copy the cookies of the logged-in `browser` to the HTTP session before the first
+    fetch, so a fresh run does not start anonymous and fall back to the browser.
+    Fetches that still fall back refresh the session afterwards.
+    """
+    if os.getenv("PA_HTTP_FETCH", "1") != "1":
+        return
+    try:
+        # get_cookies() only returns the cookies of the page the browser is on
+        if "playerauctions.com" not in (browser.driver.current_url or ""):
+            browser.get(PA_HOME_URL)
+        __sync_browser_session(browser)
+        print(f"PA HTTP session seeded with {len(get_http_session('playerauctions').cookies)} cookies")
+    except Exception as e:
+        print(f"Error seeding PA HTTP session: {e}")
+
+
+def __browser_html(url: str, browser: SeleniumUtil, is_http_fetch: bool) -> str:
+    __count_fetch("browser")
+    browser.get(url)
+    res = browser.driver.page_source
+    if is_http_fetch:
+        __sync_browser_session(browser)
+    return res
 
 
 @retry(retries=3, delay=1.2, exception=HTTPError)
-def __get_soup(url: str, browser: SeleniumUtil) -> BeautifulSoup:
-    browser.driver.get(url)
-    res = browser.driver.page_source
-    return BeautifulSoup(res, "html.parser")
+def __get_html(
+        url: str,
+        browser: SeleniumUtil | None = None,
+        pool: SeleniumPool | None = None,
+) -> str:
+    """
+    HTML of `url` over HTTP, or loaded in `browser`, or in a browser checked out of
+    `pool` only for the fallback, so pages served over HTTP never wait for a browser.
+    """
+    is_http_fetch = os.getenv("PA_HTTP_FETCH", "1") == "1"
+    if is_http_fetch:
+        html = __fetch_html(url)
+        if html is not None:
+            __count_fetch("http")
+            return html
+    if browser is not None:
+        return __browser_html(url, browser, is_http_fetch)
+    with pool.browser() as pool_browser:
+        return __browser_html(url, pool_browser, is_http_fetch)
+
+
+def __record_page(url: str, html: str) -> None:
+    # Pages kept in PA_RECORD_DIR are replayed by check_parser_parity()
+    record_dir = os.getenv("PA_RECORD_DIR")
+    if not record_dir:
+        return
+    path = pathlib.Path(record_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    name = hashlib.sha1(url.encode()).hexdigest()[:16]
+    path.joinpath(f"{name}.html").write_text(html, encoding="utf-8")
 
 
 def __extract_offer_items_from_soup(soup: BeautifulSoup) -> list[OfferItem]:
@@ -124,26 +260,32 @@ def __extract_delivery_time(
 ) -> DeliveryTime:
     delivery_text_tag = tag.select_one(".OLP-delivery-text")
     if delivery_text_tag:
-        delivery_text = delivery_text_tag.get_text(strip=True)
-        delivery_splitted = delivery_text.split(" ")
-        return DeliveryTime(
-            value=int(delivery_splitted[0]),
-            unit=TimeUnit(delivery_splitted[1]),
-        )
+        return __delivery_time_from_text(delivery_text_tag.get_text(strip=True))
     raise PACrawlerError("Can't extract delivery time")
 
 
+def __delivery_time_from_text(delivery_text: str) -> DeliveryTime:
+    delivery_splitted = delivery_text.split(" ")
+    return DeliveryTime(
+        value=int(delivery_splitted[0]),
+        unit=TimeUnit(delivery_splitted[1]),
+    )
+
+
 def __extract_price(
         tag: Tag,
 ) -> float:
     price_tag = tag.select_one(".offer-price-tag")
     if price_tag:
-        price_txt = price_tag.get_text(strip=True).replace("$", "")
-        return float(price_txt)
+        return __price_from_text(price_tag.get_text(strip=True))
 
     raise PACrawlerError("Can't extract price")
 
 
+def __price_from_text(price_text: str) -> float:
+    return float(price_text.replace("$", ""))
+
+
 def __extract_quantity(
         tag: Tag,
 ) -> int:
@@ -157,28 +299,281 @@ def __extract_quantity(
 def __extract_min_unit_and_min_stock(
         soup: BeautifulSoup,
 ) -> dict:
-    for script_tag in soup.select("script"):
-        if "varoffersModel" in script_tag.text.replace(" ", ""):
-            ctx = execjs.compile(script_tag.text)
-            offers_model = ctx.eval("offersModel")
-            res_dict = {}
-            for offer_model in offers_model:
-                res_dict[str(offer_model["id"])] = {
-                    "min_unit": offer_model["currencyPerUnit"],
-                    "min_stock": offer_model["currencyPerUnit"]
-                                 * offer_model["minValue"],
-                }
-
-            return res_dict
+    return __offers_model_from_scripts(script_tag.text for script_tag in soup.select("script"))
+
+
+def __offers_model_from_scripts(
+        script_texts: Iterable[str],
+) -> dict:
+    for script_text in script_texts:
+        match = OFFERS_MODEL_PATTERN.search(script_text)
+        if match is None:
+            continue
+        offers_model = __decode_js_literal(script_text, match.end())
+        if offers_model is None:
+            # Not plain JSON/JSON5, let a JS runtime evaluate the whole script
+            offers_model = execjs.compile(script_text).eval("offersModel")
+        res_dict = {}
+        for offer_model in offers_model:
+            res_dict[str(offer_model["id"])] = {
+                "min_unit": offer_model["currencyPerUnit"],
+                "min_stock": offer_model["currencyPerUnit"]
+                             * offer_model["minValue"],
+            }
+
+        return res_dict
 
     raise PACrawlerError("Can't extract min_unit and min_stock")
 
 
+def __js_literal_end(text: str, start: int) -> int | None:
+    """
+    Index after the array/object literal opening at `start`, skipping brackets in strings.
+    """
+    depth = 0
+    quote = None
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "\"'`":
+            quote = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def __decode_js_literal(text: str, start: int) -> list | dict | None:
+    """
+    Decode the literal assigned at `start` as JSON, then JSON5, None when neither can.
+    """
+    if start >= len(text) or text[start] not in "[{":
+        return None
+    try:
+        # raw_decode stops at the end of the literal, no bracket matching needed
+        return JSON_DECODER.raw_decode(text, start)[0]
+    except ValueError:
+        pass
+    if json5 is None:
+        return None
+    end = __js_literal_end(text, start)
+    if end is None:
+        return None
+    try:
+        return json5.loads(text[start:end])
+    except ValueError:
+        return None
+
+
+OFFER_FIELD_CLASSES = (
+    "offerid",
+    "offer-title-lv1",
+    "offer-title-lv2",
+    "username",
+    "OLP-delivery-text",
+    "offer-price-tag",
+    "OLP-input-number",
+)
+CLASS_XPATH = "//{0}[contains(concat(' ', normalize-space(@class), ' '), ' {1} ')]"
+
+if etree is not None:
+    OFFER_ITEM_XPATH = etree.XPath(CLASS_XPATH.format("*", "offer-item"))
+    PRODUCT_ITEM_XPATH = etree.XPath(CLASS_XPATH.format("*", "product-item"))
+    SELLER_NAME_XPATH = etree.XPath("." + CLASS_XPATH.format("div", "offer-seller-name") + "//a//span")
+
+
+def __lxml_text(element) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return "".join(text.strip() for text in element.itertext())
+
+
+def __lxml_offer_fields(offer_item_element) -> dict:
+    """
+    First element of each OFFER_FIELD_CLASSES class under the offer, found in one walk.
+    """
+    fields = {}
+    for element in offer_item_element.iterdescendants():
+        if not isinstance(element.tag, str):
+            continue
+        for class_name in (element.get("class") or "").split():
+            if class_name in OFFER_FIELD_CLASSES and class_name not in fields:
+                fields[class_name] = element
+    return fields
+
+
+def __lxml_offer_item(offer_item_element, offers_model: dict) -> OfferItem:
+    fields = __lxml_offer_fields(offer_item_element)
+
+    if "offerid" not in fields:
+        raise PACrawlerError("Can't extract offer id")
+    offer_item_id = __lxml_text(fields["offerid"])
+
+    offer_title_lv1 = __lxml_text(fields["offer-title-lv1"]) if "offer-title-lv1" in fields else ""
+    offer_title_lv2 = __lxml_text(fields["offer-title-lv2"]) if "offer-title-lv2" in fields else ""
+
+    name = __lxml_text(fields["username"]) if "username" in fields else ""
+    if name == "":
+        seller_name_elements = SELLER_NAME_XPATH(offer_item_element)
+        if not seller_name_elements:
+            raise PACrawlerError("Can't extract seller name")
+        name = __lxml_text(seller_name_elements[0])
+
+    if "OLP-delivery-text" not in fields:
+        raise PACrawlerError("Can't extract delivery time")
+    delivery_time = __delivery_time_from_text(__lxml_text(fields["OLP-delivery-text"]))
+
+    min_stock = offers_model[offer_item_id].get("min_stock", None)
+    min_unit = offers_model[offer_item_id].get("min_unit", None)
+
+    if "OLP-input-number" not in fields:
+        raise PACrawlerError("Can't extract quantity")
+    quantity = int(fields["OLP-input-number"].attrib["value"])
+
+    if "offer-price-tag" not in fields:
+        raise PACrawlerError("Can't extract price")
+    price = __price_from_text(__lxml_text(fields["offer-price-tag"]))
+
+    return OfferItem(
+        offer_id=offer_item_id,
+        server=f"{offer_title_lv1} - {offer_title_lv2}",
+        seller=Seller(name=name, feedback_count=0, canGetFeedback=True),
+        delivery_time=delivery_time,
+        min_stock=min_stock,
+        min_unit=min_unit,
+        quantity=quantity,
+        price=price,
+    )
+
+
+def __parse_with_lxml(html: str) -> list[OfferItem]:
+    root = lxml_html.fromstring(html)
+    offers_model = __offers_model_from_scripts(script.text or "" for script in root.iter("script"))
+    return [
+        __lxml_offer_item(offer_item_element, offers_model)
+        for offer_item_element in OFFER_ITEM_XPATH(root) + PRODUCT_ITEM_XPATH(root)
+    ]
+
+
+def __parse_with_bs4(html: str) -> list[OfferItem]:
+    return __extract_offer_items_from_soup(BeautifulSoup(html, "html.parser"))
+
+
+PA_PARSERS: dict[str, Callable[[str], list[OfferItem]]] = {
+    "bs4": __parse_with_bs4,
+    "lxml": __parse_with_lxml,
+}
+
+
+_unknown_parsers: set[str] = set()
+_unknown_parsers_lock = threading.Lock()
+
+
+def __parser_name(parser: str) -> str:
+    """
+    `parser` when it is usable, else bs4. An unknown name is reported once, not on every page.
+    """
+    if parser not in PA_PARSERS:
+        with _unknown_parsers_lock:
+            if parser not in _unknown_parsers:
+                _unknown_parsers.add(parser)
+                print(f"Unknown PA_PARSER {parser!r}, expected one of {', '.join(PA_PARSERS)}; using bs4")
+        return "bs4"
+    if parser == "lxml" and lxml_html is None:
+        return "bs4"
+    return parser
+
+
+def parse_offer_items(html: str, parser: str | None = None) -> list[OfferItem]:
+    """
+    Parse the offers of a PA listing page with PA_PARSER (lxml by default, bs4 is
+    the reference implementation and is used when lxml is not installed or
+    PA_PARSER is not a known parser).
+    """
+    return PA_PARSERS[__parser_name(parser or os.getenv("PA_PARSER", "lxml"))](html)
+
+
+def compare_parsers(html: str) -> list[str]:
+    """
+    Differences between the lxml and bs4 results of one page, empty when they agree.
+    """
+    results = {}
+    for parser in PA_PARSERS:
+        try:
+            results[parser] = [offer_item.model_dump() for offer_item in parse_offer_items(html, parser)]
+        except Exception as e:
+            results[parser] = f"{type(e).__name__}: {e}"
+    if results["bs4"] == results["lxml"]:
+        return []
+    if isinstance(results["bs4"], str) or isinstance(results["lxml"], str):
+        return [f"bs4={results['bs4']!r} lxml={results['lxml']!r}"]
+    differences = [f"bs4 found {len(results['bs4'])} offers, lxml {len(results['lxml'])}"]
+    for bs4_item, lxml_item in zip(results["bs4"], results["lxml"]):
+        if bs4_item != lxml_item:
+            differences.append(f"bs4={bs4_item} lxml={lxml_item}")
+    return differences
+
+
+def check_parser_parity(directory: str) -> bool:
+    """
+    Run compare_parsers() on every page recorded in `directory` (see PA_RECORD_DIR).
+    False when a page differs or the directory has no pages.
+    """
+    pages = sorted(pathlib.Path(directory).glob("*.html"))
+    if not pages:
+        print(f"No recorded pages in {directory}")
+        return False
+    is_same = True
+    for page in pages:
+        html = page.read_text(encoding="utf-8")
+        differences = compare_parsers(html)
+        if differences:
+            print(f"{page.name}: MISMATCH")
+        else:
+            try:
+                print(f"{page.name}: ok, {len(parse_offer_items(html, 'bs4'))} offers")
+            except Exception as e:
+                print(f"{page.name}: ok, both raise {type(e).__name__}: {e}")
+        for difference in differences:
+            print(f"  {difference}")
+        is_same = is_same and not differences
+    return is_same
+
+
 @retry(5, delay=0.25, exception=PACrawlerError)
 def extract_offer_items(
         url: str,
-        browser: SeleniumUtil,
+        browser: SeleniumUtil | None = None,
+        pool: SeleniumPool | None = None,
 ) -> list[OfferItem]:
-    return __extract_offer_items_from_soup(
-        __get_soup(url, browser),
-    )
+    html = __get_html(url, browser, pool)
+    __record_page(url, html)
+    return parse_offer_items(html)
+
+
+def extract_offer_items_pooled(
+        url: str,
+        pool: SeleniumPool,
+) -> list[OfferItem]:
+    """
+    Offers of `url` from the PA fetch cache, or fetched over HTTP with a browser of `pool`
+    as fallback. Only the caller that starts the fetch may take a browser, callers of the
+    same url wait for it.
+    """
+    return get_pa_fetch_cache().get_or_fetch(url, lambda: extract_offer_items(url, pool=pool))
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m utils.pa_extract [dir ...], the pages committed in PA_PARITY_PAGES_PATH by default
+    directories = sys.argv[1:] or [constants.PA_PARITY_PAGES_PATH]
+    sys.exit(0 if all([check_parser_parity(directory) for directory in directories]) else 1)
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+R = TypeVar("R")
+
+
+class RateLimiter:
+    """
+    Token bucket limiter, `rate` requests per `period` seconds with bursts up to `capacity`.
+    Callers block in acquire() until a token is available instead of sleeping a fixed time.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0, capacity: float | None = None):
+        self.rate = rate / period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.acquire_count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` from the bucket, waiting for the refill if needed.
+
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                now = time.monotonic()
+                if self._paused_until > now:
+                    wait = self._paused_until - now
+                elif self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquire_count += 1
+                    self.total_wait += waited
+                    self.max_wait = max(self.max_wait, waited)
+                    return waited
+                else:
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for `seconds`, used when the API answers 429.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.acquire_count,
+                "total_wait": round(self.total_wait, 3),
+                "avg_wait": round(self.total_wait / self.acquire_count, 3) if self.acquire_count else 0.0,
+                "max_wait": round(self.max_wait, 3),
+            }
+
+
+def _quota_error_retry_after(error: Exception) -> float | None:
+    """
+    Return the Retry-After delay of a 429 answer from gspread or googleapiclient,
+    0 when the answer has no header, and None when `error` is not a quota error.
+    """
+    status, headers = None, {}
+    response = getattr(error, "response", None)  # gspread.exceptions.APIError
+    if response is not None and hasattr(response, "status_code"):
+        status, headers = response.status_code, response.headers
+    resp = getattr(error, "resp", None)  # googleapiclient.errors.HttpError
+    if resp is not None and hasattr(resp, "status"):
+        status, headers = resp.status, resp
+    status = getattr(error, "status", status)  # utils.local_sheets.LocalQuotaError
+    headers = getattr(error, "headers", headers)
+    if status is None or int(status) != 429:
+        return None
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return 0
+
+
+class SheetsRateLimiter:
+    """
+    One scheduler for every Google Sheets request of the process, gspread and
+    googleapiclient alike. Reads and writes have separate budgets, and a 429 pauses
+    the matching budget for Retry-After (or an exponential backoff) before retrying.
+    """
+
+    def __init__(
+            self,
+            read_per_minute: float,
+            write_per_minute: float,
+            max_retries: int = 5,
+            max_backoff: float = 64,
+    ):
+        self.limiters = {
+            "read": RateLimiter(read_per_minute),
+            "write": RateLimiter(write_per_minute),
+        }
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.quota_errors = 0
+
+    def call(self, kind: str, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        limiter = self.limiters[kind]
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                retry_after = _quota_error_retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                self.quota_errors += 1
+                wait = max(retry_after, backoff)
+                print(f"Sheets {kind} quota exceeded, retrying in {wait:.1f} seconds")
+                limiter.pause(wait)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def stats(self) -> dict:
+        return {
+            **{kind: limiter.stats() for kind, limiter in self.limiters.items()},
+            "quota_errors": self.quota_errors,
+        }
+
+
+_sheets_limiter: SheetsRateLimiter | None = None
+_sheets_limiter_lock = threading.Lock()
+
+
+def get_sheets_limiter() -> SheetsRateLimiter:
+    # Created lazily so the SHEETS_* settings are read after settings.env is loaded
+    global _sheets_limiter
+    with _sheets_limiter_lock:
+        if _sheets_limiter is None:
+            _sheets_limiter = SheetsRateLimiter(
+                read_per_minute=float(os.getenv("SHEETS_READ_PER_MINUTE", 60)),
+                write_per_minute=float(os.getenv("SHEETS_WRITE_PER_MINUTE", 60)),
+                max_retries=int(os.getenv("SHEETS_MAX_RETRIES", 5)),
+            )
+        return _sheets_limiter
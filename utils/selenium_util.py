@@ -1,5 +1,10 @@
+import os
 import pathlib
+import queue
+import threading
 import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
 
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
@@ -16,14 +21,62 @@ PATH_TO_EXTENSION = pathlib.Path(__file__).parent.parent.joinpath(
     "extensions/rektcaptcha"
 )
 
+SCRAPE_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.css", "*.mp4", "*.webm",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*",
+]
+SCRAPE_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+}
+PAGE_METRICS_SCRIPT = """
+const entries = performance.getEntriesByType("navigation").concat(performance.getEntriesByType("resource"));
+return entries.reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+
+def scrape_blocked_urls() -> list[str]:
+    blocked_urls = os.getenv("SCRAPE_BLOCKED_URLS")
+    if not blocked_urls:
+        return SCRAPE_BLOCKED_URLS
+    return [url.strip() for url in blocked_urls.split(",") if url.strip()]
+
+
+def print_page_metrics(metrics: dict) -> None:
+    print(f"Loaded {metrics['url']} in {metrics['load_time']:.2f}s, {metrics['bytes'] / 1024:.0f} KB")
+
 
 class SeleniumUtil:
-    def __init__(self, mode: int):
+    """
+    :param mode: 1 visible browser with the captcha extension, 2 headless browser.
+    :param profile: "default", or "scrape" for DOM-only page loads: eager page load strategy,
+        images off in the content settings, and images, fonts, stylesheets and trackers
+        blocked at the network level through CDP (SCRAPE_BLOCKED_URLS).
+    :param metrics_hook: Called by get() with the url, load time and bytes transferred of each page.
+    """
+
+    def __init__(
+            self,
+            mode: int,
+            profile: str = "default",
+            metrics_hook: Callable[[dict], None] | None = None,
+    ):
         _driver_path = ChromeDriverManager().install()
         _chrome_service = Service(executable_path=_driver_path)
         _chrome_options = webdriver.ChromeOptions()
         _retry_time = constants.RETRIES_TIME
         self.driver = None
+        self.profile = profile
+        if metrics_hook is None and os.getenv("SCRAPE_METRICS", "0") == "1":
+            metrics_hook = print_page_metrics
+        self.metrics_hook = metrics_hook
+        if profile == "scrape":
+            _chrome_options.page_load_strategy = "eager"
+            _chrome_options.add_experimental_option("prefs", SCRAPE_PREFS)
+        elif profile != "default":
+            raise ValueError("Invalid profile")
         if mode == 1:
             _chrome_options.add_argument(f"load-extension={PATH_TO_EXTENSION}")
             for _ in range(_retry_time):
@@ -51,13 +104,32 @@ class SeleniumUtil:
                 raise WebDriverException("Failed to open driver and navigate to URL after retries")
         else:
             raise ValueError("Invalid mode")
+        if profile == "scrape":
+            self.__block_urls(scrape_blocked_urls())
+
+    def __block_urls(self, urls: list[str]) -> None:
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+        except WebDriverException as e:
+            print(f"Error blocking urls: {e}")
 
     def get(self, url):
+        _start = time.monotonic()
         try:
             self.driver.get(url)
         except WebDriverException as e:
             print(f"Error navigating to {url}: {e}")
             raise WebDriverException("Block by site")
+        if self.metrics_hook is not None:
+            self.metrics_hook(self.page_metrics(url, time.monotonic() - _start))
+
+    def page_metrics(self, url: str, load_time: float) -> dict:
+        try:
+            transferred = self.driver.execute_script(PAGE_METRICS_SCRIPT) or 0
+        except WebDriverException:
+            transferred = 0
+        return {"url": url, "load_time": load_time, "bytes": int(transferred)}
 
     @retry(retries=10, delay=1.2, exception=WebDriverException)
     def click_by_inner_text(self, text):
@@ -71,3 +143,113 @@ class SeleniumUtil:
         self.driver.close()
         self.driver.quit()
         self.driver = None
+
+
+class SeleniumPool:
+    """
+    N drivers handed out through a work queue so pages can be loaded concurrently.
+    Each driver keeps a health state; one that fails `max_failures` times in a row is
+    replaced by a fresh driver of the pool's mode. Drivers passed in `browsers` belong
+    to the caller and are never closed by the pool.
+    """
+
+    def __init__(
+            self,
+            size: int = 0,
+            mode: int = 2,
+            browsers: list[SeleniumUtil] | None = None,
+            max_failures: int = 3,
+            profile: str = "scrape",
+    ):
+        self.mode = mode
+        self.profile = profile
+        self.max_failures = max_failures
+        self.browsers: list[SeleniumUtil] = list(browsers or [])
+        self._owned: set[int] = set()
+        if not self.browsers:
+            self.browsers = [SeleniumUtil(mode=mode, profile=profile) for _ in range(size)]
+            self._owned = {id(browser) for browser in self.browsers}
+        if not self.browsers:
+            raise ValueError("Empty browser pool")
+        self.health: dict[int, dict] = {
+            id(browser): {"pages": 0, "failures": 0, "healthy": True} for browser in self.browsers
+        }
+        self._idle: queue.Queue[SeleniumUtil] = queue.Queue()
+        self._lock = threading.Lock()
+        for browser in self.browsers:
+            self._idle.put(browser)
+
+    @property
+    def size(self) -> int:
+        return len(self.browsers)
+
+    def checkout(self, timeout: float | None = None) -> SeleniumUtil:
+        return self._idle.get(timeout=timeout)
+
+    def checkin(self, browser: SeleniumUtil, healthy: bool = True) -> None:
+        with self._lock:
+            state = self.health[id(browser)]
+            state["pages"] += 1
+            state["failures"] = 0 if healthy else state["failures"] + 1
+            state["healthy"] = state["failures"] < self.max_failures
+            is_replaced = not state["healthy"]
+        # Chrome is launched outside the lock so the other check-ins are not held up
+        idle_browser = browser
+        try:
+            if is_replaced:
+                idle_browser = self._replace(browser)
+        finally:
+            # Always back in the queue, or the workers waiting in checkout() never return
+            self._idle.put(idle_browser)
+
+    def _replace(self, browser: SeleniumUtil) -> SeleniumUtil:
+        """
+        A new driver in place of `browser`, or `browser` with its failures reset when
+        the new driver cannot be launched.
+        """
+        print("Replacing unhealthy browser")
+        try:
+            new_browser = SeleniumUtil(mode=self.mode, profile=self.profile)
+        except Exception as e:
+            print(f"Error launching replacement browser, keeping the old one: {e}")
+            with self._lock:
+                self.health[id(browser)]["failures"] = 0
+                self.health[id(browser)]["healthy"] = True
+            return browser
+        with self._lock:
+            self.browsers[self.browsers.index(browser)] = new_browser
+            del self.health[id(browser)]
+            self.health[id(new_browser)] = {"pages": 0, "failures": 0, "healthy": True}
+            is_owned = id(browser) in self._owned
+            self._owned.discard(id(browser))
+            self._owned.add(id(new_browser))
+        if is_owned:
+            try:
+                browser.close()
+            except Exception:
+                pass
+        return new_browser
+
+    @contextmanager
+    def browser(self, timeout: float | None = None) -> Iterator[SeleniumUtil]:
+        browser = self.checkout(timeout)
+        try:
+            yield browser
+        except WebDriverException:
+            self.checkin(browser, healthy=False)
+            raise
+        except BaseException:
+            self.checkin(browser)
+            raise
+        else:
+            self.checkin(browser)
+
+    def close(self) -> None:
+        # Only the drivers the pool launched, the caller closes the ones it passed in
+        for browser in self.browsers:
+            if id(browser) not in self._owned:
+                continue
+            try:
+                browser.close()
+            except Exception:
+                pass
@@ -0,0 +1,103 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+from utils.ggsheet import GSheet
+from utils.local_sheets import LocalGSheet, LocalSheetsService, LocalWorkbookStore
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+
+
+class SheetBackend(ABC):
+    """
+    Where the tool reads and writes its spreadsheets: `gsheet()` replaces GSheet for
+    the main worksheet and `sheets_service()` the Sheets service used by StockManager.
+    """
+    name = ""
+
+    @abstractmethod
+    def gsheet(self, keypath: str = "key.json"):
+        ...
+
+    @abstractmethod
+    def sheets_service(self, credentials_file: str = "key.json"):
+        ...
+
+
+class GoogleSheetBackend(SheetBackend):
+    name = "google"
+
+    def __init__(self):
+        self._credentials: dict[str, Credentials] = {}
+        self._lock = threading.Lock()
+
+    def credentials(self, credentials_file: str) -> Credentials:
+        # One Credentials object per key file, its access token is reused until it expires
+        with self._lock:
+            if credentials_file not in self._credentials:
+                self._credentials[credentials_file] = Credentials.from_service_account_file(
+                    credentials_file,
+                    scopes=SCOPES,
+                )
+            return self._credentials[credentials_file]
+
+    def gsheet(self, keypath: str = "key.json") -> GSheet:
+        return GSheet(keypath)
+
+    def sheets_service(self, credentials_file: str = "key.json"):
+        return build(
+            'sheets',
+            'v4',
+            credentials=self.credentials(credentials_file),
+            static_discovery=True,
+            cache_discovery=False,
+        )
+
+
+class LocalSheetBackend(SheetBackend):
+    """
+    Spreadsheets read from LOCAL_SHEET_DIR, with LOCAL_SHEET_LATENCY seconds per
+    request and LOCAL_SHEET_QUOTA_ERROR_RATE of the requests answered with a 429.
+    """
+    name = "local"
+
+    def __init__(self, store: LocalWorkbookStore):
+        self.store = store
+
+    def gsheet(self, keypath: str = "key.json") -> LocalGSheet:
+        return LocalGSheet(self.store)
+
+    def sheets_service(self, credentials_file: str = "key.json") -> LocalSheetsService:
+        return LocalSheetsService(self.store)
+
+
+_backend: SheetBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_sheet_backend() -> SheetBackend:
+    # Chosen lazily with SHEET_BACKEND=google|local once settings.env is loaded
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.getenv("SHEET_BACKEND", "google") == "local":
+                _backend = LocalSheetBackend(
+                    LocalWorkbookStore(
+                        directory=os.getenv("LOCAL_SHEET_DIR", "storage/local_sheets"),
+                        latency=float(os.getenv("LOCAL_SHEET_LATENCY", 0)),
+                        quota_error_rate=float(os.getenv("LOCAL_SHEET_QUOTA_ERROR_RATE", 0)),
+                        persist=os.getenv("LOCAL_SHEET_PERSIST", "0") == "1",
+                    )
+                )
+            else:
+                _backend = GoogleSheetBackend()
+        return _backend
+
+
+def set_sheet_backend(backend: SheetBackend) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -1,3 +1,4 @@
+import functools
 from datetime import datetime
 
 import gspread.urls
@@ -11,34 +12,84 @@ from pydantic import BaseModel, ValidationError
 T = TypeVar("T", bound=BaseGSheetModel)
 
 
+class ModelLayout:
+    """
+    Column layout of a set of models compiled once: the contiguous range
+    `first_column:last_column` covering every field and, for each model, the offset
+    of each field inside that range.
+    """
+
+    def __init__(self, models: tuple[Type[T], ...]):
+        self.models = models
+        self.fields: list[list[tuple[str, int]]] = []
+        self._shifted_fields: dict[str, list[list[tuple[str, int]]]] = {}
+        indexes = [
+            column_index(proper.metadata[0])
+            for model in models
+            for proper in model.fields_exclude_row_index().values()
+        ]
+        self.first_index = min(indexes)
+        self.last_index = max(indexes)
+        self.first_column = gspread.utils.rowcol_to_a1(1, self.first_index)[:-1]
+        self.last_column = gspread.utils.rowcol_to_a1(1, self.last_index)[:-1]
+        for model in models:
+            self.fields.append([
+                (field_name, column_index(proper.metadata[0]) - self.first_index)
+                for field_name, proper in model.fields_exclude_row_index().items()
+            ])
+
+    def row_range(self, row_index: int) -> str:
+        return f"{self.first_column}{row_index}:{self.last_column}{row_index}"
+
+    def with_first_column(self, first_column: str) -> list[list[tuple[str, int]]]:
+        # Offsets for values that start at `first_column` instead of the layout's own first column
+        if first_column not in self._shifted_fields:
+            shift = self.first_index - column_index(first_column)
+            self._shifted_fields[first_column] = [
+                [(field_name, offset + shift) for field_name, offset in fields] for fields in self.fields
+            ]
+        return self._shifted_fields[first_column]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_layout(models: tuple[Type[T], ...]) -> ModelLayout:
+    return ModelLayout(models)
+
+
+def _models_from_row_values(
+    models: tuple[Type[T], ...],
+    fields: list[list[tuple[str, int]]],
+    row_values: list[str],
+    row_index: int,
+) -> list[T]:
+    result_model = []
+    for i, model in enumerate(models):
+        model_dict = {}
+        for field_name, offset in fields[i]:
+            value = row_values[offset] if offset < len(row_values) else None
+            # An empty cell comes back as "" inside a range but as nothing on its own
+            model_dict[field_name] = value if value != "" else None
+        try:
+            _model = model.model_validate(model_dict)
+            _model.row_index = row_index
+            result_model.append(_model)
+        except ValidationError as e:
+            raise ValidationError(f"Validate error for {model} in row_index: {i}") from e
+    return result_model
+
+
 def query_model_from_worksheet(
     worksheet: gspread.worksheet.Worksheet,
     model: Type[T],
     row_index: list[int],
 ) -> list[T]:
-    cells: list[str] = []
-    model_fields = model.fields_exclude_row_index()
-    for index in row_index:
-        for _, propers in model_fields.items():
-            cells.append(
-                f"{propers.metadata[0]}{index}",
-            )
-    query_values = [value.first() for value in worksheet.batch_get(cells)]
+    layout = compile_layout((model,))
+    # One request, one contiguous range per row
+    query_values = worksheet.batch_get([layout.row_range(index) for index in row_index])
     model_list: list[T] = []
-    num_of_keys = len(model_fields.keys())
-    for i, index in enumerate(row_index):
-        model_dict = {}
-        for j, model_field_name in enumerate(model_fields.keys()):
-            model_dict[model_field_name] = query_values[i * num_of_keys + j]
-        try:
-            _model = model.model_validate(
-                model_dict,
-            )
-        except ValidationError as e:
-            raise ValidationError(f"Validate error for {model} in row_index: {index}") from e
-
-        _model.row_index = index
-        model_list.append(_model)
+    for index, value_range in zip(row_index, query_values):
+        row_values = value_range[0] if value_range else []
+        model_list.extend(_models_from_row_values(layout.models, layout.fields, row_values, index))
     return model_list
 
 
@@ -70,29 +121,34 @@ def query_multi_model_from_worksheet(
     models: list[Type[T]],
     row_index: int,
 ) -> list[Type[T]]:
-    cells: list[str] = []
-    for model in models:
-        model_fields = model.fields_exclude_row_index()
-        for _, proper in model_fields.items():
-            cells.append(
-                f"{proper.metadata[0]}{row_index}",
-            )
-    query_values = [value.first() for value in worksheet.batch_get(cells)]
-    result_model = []
-    count: int = 0
-    for i, model in enumerate(models):
-        model_dict = {}
-        model_fields = model.fields_exclude_row_index()
-        for j, field_name in enumerate(model_fields.keys()):
-            model_dict[field_name] = query_values[count]
-            count += 1
-        try:
-            _model = model.model_validate(model_dict)
-            _model.row_index = row_index
-            result_model.append(_model)
-        except ValidationError as e:
-            raise ValidationError(f"Validate error for {model} in row_index: {i}") from e
-    return result_model
+    layout = compile_layout(tuple(models))
+    query_values = worksheet.get(layout.row_range(row_index))
+    row_values = query_values[0] if query_values else []
+    return _models_from_row_values(layout.models, layout.fields, row_values, row_index)
+
+
+def column_index(column: str) -> int:
+    return gspread.utils.a1_to_rowcol(f"{column}1")[1]
+
+
+def read_worksheet_snapshot(
+    worksheet: gspread.worksheet.Worksheet,
+    first_column: str,
+    last_column: str,
+) -> list[list[str]]:
+    # One read for the whole block, item i of the result is sheet row i + 1
+    return worksheet.get(f"{first_column}:{last_column}")
+
+
+def query_multi_model_from_snapshot(
+    snapshot: list[list[str]],
+    models: list[Type[T]],
+    row_index: int,
+    first_column: str,
+) -> list[Type[T]]:
+    layout = compile_layout(tuple(models))
+    row_values = snapshot[row_index - 1] if row_index <= len(snapshot) else []
+    return _models_from_row_values(layout.models, layout.with_first_column(first_column), row_values, row_index)
 
 
 def update_string_to_worksheet(
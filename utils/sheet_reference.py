@@ -0,0 +1,65 @@
+from utils.google_api import fetch_ranges_async
+from utils.ttl_cache import get_reference_cache, reference_ttl
+
+
+class ReferenceResolver:
+    """
+    Collects the (spreadsheet id, A1 range) references of a cycle and reads them
+    with one batchGet per spreadsheet. StockManager looks values up here first and
+    only calls the API itself for references that were not resolved.
+
+    References with a cached `kind` (see utils.ttl_cache) are served from the
+    shared TTL cache when still fresh and stored there once read.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, list[str]] = {}
+        self._kinds: dict[tuple[str, str], str] = {}
+        self._values: dict[tuple[str, str], list[list[str]]] = {}
+        self.request_count = 0
+
+    def add(self, spreadsheet_id: str | None, range_name: str | None, kind: str | None = None) -> None:
+        if not spreadsheet_id or not range_name:
+            return
+        key = (spreadsheet_id, range_name)
+        if key in self._values:
+            return
+        if reference_ttl(kind) > 0:
+            self._kinds[key] = kind
+            cached = get_reference_cache().get(key)
+            if cached is not None:
+                self._values[key] = cached
+                return
+        ranges = self._pending.setdefault(spreadsheet_id, [])
+        if range_name not in ranges:
+            ranges.append(range_name)
+
+    def add_references(self, references: list[tuple[str, str, str | None]]) -> None:
+        for spreadsheet_id, range_name, kind in references:
+            self.add(spreadsheet_id, range_name, kind)
+
+    def resolve(self) -> None:
+        pending, self._pending = self._pending, {}
+        # Spreadsheets are read concurrently, so the cycle waits for the slowest one only
+        futures = {
+            spreadsheet_id: fetch_ranges_async(spreadsheet_id, ranges)
+            for spreadsheet_id, ranges in pending.items()
+        }
+        for spreadsheet_id, ranges in pending.items():
+            try:
+                values = futures[spreadsheet_id].result()
+            except Exception as e:
+                # Unresolved references fall back to a direct read on lookup
+                print(f"Error resolving references of {spreadsheet_id}: {e}")
+                continue
+            finally:
+                self.request_count += 1
+            for range_name, value in zip(ranges, values):
+                key = (spreadsheet_id, range_name)
+                self._values[key] = value
+                if key in self._kinds:
+                    get_reference_cache().set(key, value, reference_ttl(self._kinds[key]))
+        print(f"Resolved {len(self._values)} references with {self.request_count} requests")
+
+    def lookup(self, spreadsheet_id: str, range_name: str) -> list[list[str]] | None:
+        return self._values.get((spreadsheet_id, range_name))
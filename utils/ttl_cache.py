@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# settings.env variable holding the TTL in seconds of each kind of cached reference
+TTL_ENV_BY_KIND = {
+    "cny_rate": "CACHE_TTL_CNY_RATE",
+    "blacklist": "CACHE_TTL_BLACKLIST",
+    "game_list": "CACHE_TTL_GAME_LIST",
+}
+DEFAULT_TTL = 300
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after a per-entry TTL, with hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """
+        Drop one entry, or every entry when `key` is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_reference_cache: TTLCache | None = None
+_reference_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> TTLCache:
+    # Created lazily so CACHE_MAX_ENTRIES is read after settings.env is loaded
+    global _reference_cache
+    with _reference_cache_lock:
+        if _reference_cache is None:
+            _reference_cache = TTLCache(int(os.getenv("CACHE_MAX_ENTRIES", 512)))
+        return _reference_cache
+
+
+def reference_ttl(kind: str | None) -> float:
+    if kind not in TTL_ENV_BY_KIND:
+        return 0
+    return float(os.getenv(TTL_ENV_BY_KIND[kind], DEFAULT_TTL))